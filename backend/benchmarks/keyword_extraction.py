@@ -0,0 +1,52 @@
+# Keyword extraction throughput: extract_keywords in a loop against extract_keywords_many
+#
+# Run from the backend directory (needs the NLTK data):
+#   python -m benchmarks.keyword_extraction --processes 4 --chunk-size 64
+#
+# The listings in job_data/*.json (repeated --copies times) are extracted one text at a
+# time with extract_keywords, then with extract_keywords_many in this process and across
+# --processes worker processes. The extractor is warmed up before timing and each method
+# is checked against the loop's output. One JSON object is printed per method.
+
+import argparse
+import json
+import time
+from src.keyword_extraction import extract_keywords, extract_keywords_many, keyword_extractor
+from benchmarks.recommendation_load import listing_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword extraction texts per second, one at a time and batched")
+    parser.add_argument("--copies", type=int, default=1, help="times the corpus is repeated")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    args = parser.parse_args()
+
+    texts = list(listing_texts()) * args.copies
+    keyword_extractor.warm_up()
+
+    methods = [
+        ("loop", lambda: [extract_keywords(text) for text in texts]),
+        ("many", lambda: list(extract_keywords_many(texts, chunk_size=args.chunk_size))),
+        (f"many_{args.processes}_processes", lambda: list(
+            extract_keywords_many(texts, processes=args.processes, chunk_size=args.chunk_size))),
+    ]
+    expected = None
+    for method, extract in methods:
+        start = time.perf_counter()
+        keywords = extract()
+        seconds = time.perf_counter() - start
+        if expected is None:
+            expected = keywords
+        print(json.dumps({
+            "method": method,
+            "texts": len(texts),
+            "chunk_size": args.chunk_size,
+            "matches_loop": keywords == expected,
+            "seconds": round(seconds, 3),
+            "texts_per_second": round(len(texts) / seconds, 1),
+        }))
+
+
+if __name__ == "__main__":
+    main()
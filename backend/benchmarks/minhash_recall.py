@@ -0,0 +1,95 @@
+# Recall of MinHash/LSH candidate generation against the exact Jaccard scorer
+#
+# Run from the backend directory:
+#   python -m benchmarks.minhash_recall --students 500 --job-posts 20000 --bands 32,64 --rows 1,2,4
+#
+# For every bands/rows combination the job posts are inserted into an LSH index, the
+# candidates for each student are rescored exactly and the top k is compared to the
+# exact top k over the whole catalogue. One JSON object is printed per combination.
+
+import argparse
+import json
+import random
+import time
+import numpy as np
+from src.minhash import MinHasher, LSHIndex
+from src.similarity import build_vocabulary, encode_keyword_sets, jaccard_matrix, jaccard_scores, top_k_per_row
+
+
+# Keyword sets drawn mostly from one "topic" with some common words mixed in, so that
+# similar students and job posts exist like they do in the real catalogue
+def generate_keyword_sets(count: int, topics: list[list[str]], common: list[str], size: tuple[int, int], rng: random.Random):
+    keyword_sets = []
+    for _ in range(count):
+        topic = rng.choice(topics)
+        n = rng.randint(*size)
+        n_common = rng.randint(0, n // 3)
+        keyword_sets.append(set(rng.sample(topic, n - n_common)) | set(rng.sample(common, n_common)))
+    return keyword_sets
+
+
+def recall_at_k(approximate: list[list[int]], exact: list[list[int]]):
+    recalls = [len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact) if e]
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall of MinHash/LSH candidates against the exact Jaccard scorer")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--job-posts", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=300)
+    parser.add_argument("--bands", default="32,64")
+    parser.add_argument("--rows", default="1,2,4")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    topics = [[f"t{t}w{w}" for w in range(40)] for t in range(args.topics)]
+    common = [f"common{w}" for w in range(200)]
+    students = generate_keyword_sets(args.students, topics, common, (5, 15), rng)
+    job_posts = generate_keyword_sets(args.job_posts, topics, common, (5, 15), rng)
+
+    start = time.perf_counter()
+    vocabulary = build_vocabulary(students, job_posts)
+    exact_scores = jaccard_matrix(encode_keyword_sets(students, vocabulary), encode_keyword_sets(job_posts, vocabulary))
+    exact = [[job_post for job_post, _ in row] for row in top_k_per_row(exact_scores, args.k)]
+    exact_seconds = time.perf_counter() - start
+
+    for bands in [int(b) for b in args.bands.split(",")]:
+        for rows in [int(r) for r in args.rows.split(",")]:
+            minhasher = MinHasher(num_perm=bands * rows, seed=args.seed)
+            lsh = LSHIndex(bands, rows)
+            start = time.perf_counter()
+            for job_post_id, keywords in enumerate(job_posts):
+                lsh.insert(job_post_id, minhasher.signature(keywords))
+            index_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            approximate = []
+            candidate_counts = []
+            for keywords in students:
+                candidates = lsh.query(minhasher.signature(keywords))
+                candidate_counts.append(len(candidates))
+                scores = jaccard_scores(keywords, {job_post_id: job_posts[job_post_id] for job_post_id in candidates})
+                scores.sort(key=lambda x: (-x[1], x[0]))
+                approximate.append([job_post_id for job_post_id, _ in scores[:args.k]])
+            query_seconds = time.perf_counter() - start
+
+            print(json.dumps({
+                "bands": bands,
+                "rows": rows,
+                "students": args.students,
+                "job_posts": args.job_posts,
+                "k": args.k,
+                "recall_at_k": round(recall_at_k(approximate, exact), 4),
+                "mean_candidates": round(float(np.mean(candidate_counts)), 1),
+                "candidate_fraction": round(float(np.mean(candidate_counts)) / args.job_posts, 4),
+                "index_seconds": round(index_seconds, 3),
+                "query_ms_per_student": round(1000 * query_seconds / args.students, 3),
+                "exact_seconds_all_students": round(exact_seconds, 3),
+            }))
+
+
+if __name__ == "__main__":
+    main()
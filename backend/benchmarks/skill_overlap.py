@@ -0,0 +1,111 @@
+# Skill overlap: python sets against integer bitsets, numpy bool arrays and sparse matrices
+#
+# Run from the backend directory:
+#   python -m benchmarks.skill_overlap --students 200 --job-posts 20000 --skills 2000
+#
+# Every student is scored against every job post on the share of the job post's skill
+# tags they have. The set-based path is the per-pair set intersection, the bitset path
+# is an AND and popcount of python ints per pair, the numpy path is a dense bool matrix
+# product and the sparse path is the one used by the recommender (src.recommendations).
+# Conversion times (ids -> bitsets/arrays) are reported separately from scoring.
+# One JSON object is printed per method.
+
+import argparse
+import json
+import random
+import time
+import numpy as np
+from src.recommendations import skill_score_matrix
+
+
+def generate_skill_sets(count: int, skills: int, size: tuple[int, int], rng: random.Random):
+    return [set(rng.sample(range(1, skills + 1), rng.randint(*size))) for _ in range(count)]
+
+
+def score_sets(student_skills: list[set[int]], job_post_skills: list[set[int]]):
+    return [
+        [len(student & required) / len(required) if required else 0.0 for required in job_post_skills]
+        for student in student_skills]
+
+
+def skill_bitset(skill_ids: set[int]):
+    bitset = 0
+    for skill_id in skill_ids:
+        bitset |= 1 << skill_id
+    return bitset
+
+
+def score_bitsets(student_bitsets: list[int], job_post_bitsets: list[int]):
+    required_counts = [required.bit_count() for required in job_post_bitsets]
+    return [
+        [(student & required).bit_count() / count if count else 0.0 for required, count in zip(job_post_bitsets, required_counts)]
+        for student in student_bitsets]
+
+
+def to_bool_matrix(skill_sets: list[set[int]], skills: int):
+    matrix = np.zeros((len(skill_sets), skills + 1), dtype=bool)
+    for row, skill_ids in enumerate(skill_sets):
+        matrix[row, list(skill_ids)] = True
+    return matrix
+
+
+def score_bool_matrices(student_matrix: np.ndarray, job_post_matrix: np.ndarray):
+    overlap = student_matrix.astype(np.float32) @ job_post_matrix.T.astype(np.float32)
+    required = job_post_matrix.sum(axis=1)
+    return np.divide(overlap, required, out=np.zeros_like(overlap), where=required > 0)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skill overlap with python sets, integer bitsets, numpy bool arrays and sparse matrices")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--job-posts", type=int, default=20000)
+    parser.add_argument("--skills", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    student_skills = generate_skill_sets(args.students, args.skills, (0, 20), rng)
+    job_post_skills = generate_skill_sets(args.job_posts, args.skills, (0, 8), rng)
+
+    expected, set_seconds = timed(score_sets, student_skills, job_post_skills)
+    expected = np.array(expected)
+
+    (student_bitsets, job_post_bitsets), bitset_convert_seconds = timed(
+        lambda: ([skill_bitset(s) for s in student_skills], [skill_bitset(s) for s in job_post_skills]))
+    bitset_scores, bitset_seconds = timed(score_bitsets, student_bitsets, job_post_bitsets)
+
+    (student_matrix, job_post_matrix), bool_convert_seconds = timed(
+        lambda: (to_bool_matrix(student_skills, args.skills), to_bool_matrix(job_post_skills, args.skills)))
+    bool_scores, bool_seconds = timed(score_bool_matrices, student_matrix, job_post_matrix)
+
+    (sparse_scores, _), sparse_seconds = timed(skill_score_matrix, student_skills, job_post_skills)
+
+    results = [
+        ("sets", expected, 0.0, set_seconds),
+        ("bitsets", np.array(bitset_scores), bitset_convert_seconds, bitset_seconds),
+        ("numpy_bool", bool_scores, bool_convert_seconds, bool_seconds),
+        # encoding is part of skill_score_matrix so it is included in the scoring time
+        ("sparse", sparse_scores.toarray(), 0.0, sparse_seconds),
+    ]
+    pairs = args.students * args.job_posts
+    for method, scores, convert_seconds, score_seconds in results:
+        print(json.dumps({
+            "method": method,
+            "students": args.students,
+            "job_posts": args.job_posts,
+            "skills": args.skills,
+            "matches_sets": bool(np.allclose(scores, expected, atol=1e-6)),
+            "convert_seconds": round(convert_seconds, 3),
+            "score_seconds": round(score_seconds, 3),
+            "ns_per_pair": round(1e9 * score_seconds / pairs, 1),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# TextRank: networkx.pagerank against the numpy/scipy implementation in src.keyword_extraction
+#
+# Run from the backend directory:
+#   python -m benchmarks.text_rank --repeat 3
+#
+# Every listing in job_data/*.json is preprocessed once (the stems the extractor ranks,
+# this needs the NLTK data, --simple-tokenizer splits on punctuation and lowercases
+# instead), then ranked with both implementations. The output reports whether the
+# top keywords (the ones extract_keyword_weights keeps) are identical for every listing,
+# the largest score difference and the time per listing of each implementation.
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from src.keyword_extraction import compute_text_rank, keyword_extractor
+
+JOB_DATA_DIR = Path(__file__).resolve().parents[2] / "job_data"
+
+
+def load_texts():
+    texts = []
+    for path in sorted(JOB_DATA_DIR.glob("*.json")):
+        with open(path) as f:
+            for listing in json.load(f):
+                text = listing.get("body_content") or listing.get("Description")
+                if text:
+                    texts.append(text)
+    return texts
+
+
+def simple_preprocess(text: str):
+    return [
+        [word.lower() for word in re.findall(r"[A-Za-z0-9]+", sentence)]
+        for sentence in re.split(r"[.!?\n]+", text)]
+
+
+# the implementation compute_text_rank replaced
+def networkx_text_rank(words, window_size=5):
+    import networkx as nx
+    graph = nx.Graph()
+    for sentence in words:
+        for i, word in enumerate(sentence):
+            for j in range(i+1, min(i+window_size, len(sentence))):
+                graph.add_edge(word, sentence[j])
+    return nx.pagerank(graph)
+
+
+def top_keywords(text_rank: dict, top_n: int):
+    return [word for word, _ in Counter(text_rank).most_common(top_n)]
+
+
+def timed(function, documents, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(words) for words in documents]
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return results, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TextRank with networkx against numpy/scipy")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per implementation, the fastest is reported")
+    parser.add_argument("--top-n", type=int, default=15)
+    parser.add_argument("--simple-tokenizer", action="store_true", help="don't use NLTK to preprocess the listings")
+    args = parser.parse_args()
+
+    networkx_imported_by_app = "networkx" in sys.modules
+    preprocess = simple_preprocess if args.simple_tokenizer else keyword_extractor.preprocess
+    documents = [preprocess(text) for text in load_texts()]
+
+    networkx_ranks, networkx_seconds = timed(networkx_text_rank, documents, args.repeat)
+    numpy_ranks, numpy_seconds = timed(compute_text_rank, documents, args.repeat)
+
+    ranking_matches = sum(
+        top_keywords(expected, args.top_n) == top_keywords(actual, args.top_n)
+        for expected, actual in zip(networkx_ranks, numpy_ranks))
+    max_difference = max(
+        (abs(expected[word] - actual.get(word, 0.0)) for expected, actual in zip(networkx_ranks, numpy_ranks) for word in expected),
+        default=0.0)
+
+    print(json.dumps({
+        "listings": len(documents),
+        "tokenizer": "simple" if args.simple_tokenizer else "nltk",
+        "ranking_matches": ranking_matches,
+        "max_score_difference": max_difference,
+        "networkx_ms_per_listing": round(1000 * networkx_seconds / len(documents), 3),
+        "numpy_ms_per_listing": round(1000 * numpy_seconds / len(documents), 3),
+        "speedup": round(networkx_seconds / numpy_seconds, 2),
+        "networkx_imported_by_app": networkx_imported_by_app,
+    }))
+
+
+if __name__ == "__main__":
+    main()
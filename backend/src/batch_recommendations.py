@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Union
+from sqlalchemy import insert
+from sqlmodel import select, delete, update, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.database import async_engine
+# imports every model so that the relationships can be resolved in the worker processes
+import src.init_db
+from src.students.models import Student, StudentRecommendation
+from src.auth.models import User
+from src.models import ConstrainedId
+from src.students.utils import get_highest_levels_of_study
+from src.recommendations import (
+    JobPostMatrix,
+    MAX_STORED_RECOMMENDATIONS,
+    get_job_post_matrix,
+    get_student_keyword_weights,
+    get_student_skill_ids
+)
+
+
+# Batch job recomputing the stored recommendations of every active student
+#
+#   python -m src.batch_recommendations --workers 4
+#
+# The recommendable job posts are loaded once and encoded as a JobPostMatrix, which is
+# sent to every worker process when it starts. Active students are sharded by id into
+# contiguous ranges, each worker loads the keywords, skill tags and degrees of a shard,
+# scores it against the matrix in chunks and replaces the shard's rows in the
+# student_recommendation table in a single transaction.
+# Web processes pick the new rows up once their recommendation cache entries expire.
+
+# students scored per sparse matrix product, bounds the memory used for the scores
+CHUNK_SIZE = 500
+
+# set in each worker process by init_worker
+job_post_matrix: Union[JobPostMatrix, None] = None
+
+
+async def get_active_student_ids(session: AsyncSession):
+    result = await session.exec(
+        select(Student.id)
+        .join(User, Student.user_id == User.id)
+        .where(User.disabled == False)
+        .order_by(Student.id))
+    return result.all()
+
+async def load_snapshot():
+    async with AsyncSession(async_engine) as session:
+        matrix = await get_job_post_matrix(session)
+        student_ids = await get_active_student_ids(session)
+    # connections can't be shared with the worker processes
+    await async_engine.dispose()
+    return matrix, student_ids
+
+def shard_student_ids(student_ids: list[ConstrainedId], shard_size: int):
+    return [student_ids[start:start + shard_size] for start in range(0, len(student_ids), shard_size)]
+
+
+def init_worker(matrix: JobPostMatrix, echo: bool):
+    global job_post_matrix
+    job_post_matrix = matrix
+    async_engine.sync_engine.echo = echo
+
+async def score_shard_async(student_ids: list[ConstrainedId]):
+    rows = []
+    async with AsyncSession(async_engine) as session:
+        student_keywords = await get_student_keyword_weights(session, student_ids)
+        student_skills = await get_student_skill_ids(session, student_ids)
+        student_levels = await get_highest_levels_of_study(session, student_ids)
+        scored_ids = [student_id for student_id in student_ids if student_keywords.get(student_id)]
+
+        for start in range(0, len(scored_ids), CHUNK_SIZE):
+            chunk = scored_ids[start:start + CHUNK_SIZE]
+            chunk_top_k = job_post_matrix.top_k(
+                [student_keywords[student_id] for student_id in chunk],
+                [student_skills.get(student_id, set()) for student_id in chunk],
+                [student_levels.get(student_id) for student_id in chunk],
+                MAX_STORED_RECOMMENDATIONS)
+            for student_id, job_post_scores in zip(chunk, chunk_top_k):
+                rows.extend(
+                    {"student_id": student_id, "job_post_id": job_post_id, "score": score}
+                    for job_post_id, score in job_post_scores)
+
+        await session.exec(
+            delete(StudentRecommendation)
+            .where(StudentRecommendation.student_id.in_(student_ids)))
+        if rows:
+            await session.exec(insert(StudentRecommendation), params=rows)
+        await session.exec(
+            update(Student)
+            .where(Student.id.in_(student_ids))
+            .values(recommendations_computed_at=func.now()))
+        await session.commit()
+    await async_engine.dispose()
+    return len(rows)
+
+def score_shard(student_ids: list[ConstrainedId]):
+    return asyncio.run(score_shard_async(student_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the stored job recommendations of every active student")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-size", type=int, default=2000)
+    parser.add_argument("--echo", action="store_true", help="log the SQL statements")
+    args = parser.parse_args()
+
+    async_engine.sync_engine.echo = args.echo
+    start = time.perf_counter()
+    matrix, student_ids = asyncio.run(load_snapshot())
+    print(f"Loaded {len(matrix)} job posts and {len(student_ids)} active students in {time.perf_counter() - start:.1f}s")
+
+    shards = shard_student_ids(student_ids, args.shard_size)
+    stored = 0
+    with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+            initargs=(matrix, args.echo)) as executor:
+        for number, (shard, count) in enumerate(zip(shards, executor.map(score_shard, shards)), start=1):
+            stored += count
+            print(f"Shard {number}/{len(shards)}: {len(shard)} students ({shard[0]} - {shard[-1]}), {count} recommendations")
+    print(f"Stored {stored} recommendations for {len(student_ids)} students in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
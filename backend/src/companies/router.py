@@ -19,6 +19,8 @@ from src.models import ConstrainedId
 from src.job_posts.models import JobPost, JobPostUpdate, JobPostCreate
 from src.job_posts.dependencies import verify_job_post_access
 from src.applications.models import JobApplicationStage
+from src.students.models import StudentCandidateRead
+from src.students.dependencies import RecommendationCommonsDep
 from typing import Union
 
 
@@ -89,6 +91,21 @@ async def get_company_job_posts(
         company_id=token_data.related_entity_id)
     return job_posts
 
+# get students matching a company job post, ranked by keywords and skill tags
+@router.get("/me/job-posts/{job_post_id}/candidates", response_model=list[StudentCandidateRead])
+async def get_company_job_post_candidates(
+    job_post_id: int,
+    commons: RecommendationCommonsDep,
+    token_data: TokenData = Depends(get_current_active_company_user),
+    session: AsyncSession = Depends(get_session),
+):
+    candidates = await service.get_company_job_post_candidates(
+        session=session,
+        company_id=token_data.related_entity_id,
+        job_post_id=job_post_id,
+        **commons)
+    return candidates
+
 
 # get a company by id
 @router.get("/{company_id}", response_model=CompanyRead)
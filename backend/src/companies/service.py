@@ -17,6 +17,7 @@ from src.job_posts.service import (
     remove_job_post_skill
 )
 from src.job_posts.exceptions import JobPostNotFound
+from src.recommendations import get_candidate_students
 from src.models import ConstrainedId
 from sqlalchemy import or_
 from src.auth.models import User
@@ -144,6 +145,20 @@ async def get_company_job_post(
     return company_job_post
 
 
+# get ranked candidate students for a company job post
+async def get_company_job_post_candidates(
+        session: AsyncSession,
+        company_id: ConstrainedId,
+        job_post_id: int,
+        limit: int = 10,
+        offset: int = 0):
+    company_job_post = await get_company_job_post(session=session, company_id=company_id, job_post_id=job_post_id)
+    if company_job_post is None:
+        raise JobPostNotFound()
+    job_post = await get_job_post_by_id(session=session, job_post_id=job_post_id)
+    return await get_candidate_students(session=session, job_post=job_post, limit=limit, offset=offset)
+
+
 # get company job posts
 async def get_company_job_posts(session: AsyncSession, company_id: ConstrainedId):
     # get the company
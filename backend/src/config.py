@@ -0,0 +1,53 @@
+from pydantic_settings import BaseSettings
+
+
+
+class RecommendationConfig(BaseSettings):
+    # "tfidf" ranks by cosine similarity of TF-IDF weighted keywords, "jaccard" treats
+    # every keyword equally
+    KEYWORD_SCORING: str = "tfidf"
+    # share of the score that comes from skill tag overlap when the job post has skill tags
+    SKILL_SCORE_WEIGHT: float = 0.3
+    # share of the score that comes from skill tag overlap for events and content, the
+    # rest comes from the keywords of their text
+    ACTIVITY_SKILL_SCORE_WEIGHT: float = 0.7
+    # MinHash/LSH candidate generation for large job catalogues, the number of
+    # permutations in a signature is MINHASH_BANDS * MINHASH_ROWS
+    MINHASH_ENABLED: bool = False
+    MINHASH_BANDS: int = 64
+    MINHASH_ROWS: int = 2
+    MINHASH_SEED: int = 1
+    # near-duplicate job posts (src/simhash.py), posts of the same company whose SimHash
+    # fingerprints differ in at most DUPLICATE_MAX_DISTANCE of their 64 bits. A duplicate is left
+    # out of the recommendations while the job post it duplicates can be recommended
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_MAX_DISTANCE: int = 3
+    # per process cache of recommendation pages, a size of 0 disables it
+    RECOMMENDATION_CACHE_SIZE: int = 10000
+    RECOMMENDATION_CACHE_TTL: int = 300
+
+
+
+recommendation_config = RecommendationConfig()
+
+
+class KeywordExtractionConfig(BaseSettings):
+    # worker processes running keyword extraction off the event loop, 0 runs it in a
+    # thread of the web process instead
+    KEYWORD_EXTRACTION_WORKERS: int = 2
+    # extractions submitted to the workers at once, further ones are rejected with a 503
+    KEYWORD_EXTRACTION_QUEUE_LIMIT: int = 32
+    # seconds to wait for a worker's result before giving up with a 503
+    KEYWORD_EXTRACTION_TIMEOUT: float = 10
+    # rows kept in the keyword_extraction_cache table, 0 disables the cache
+    KEYWORD_CACHE_MAX_ROWS: int = 100000
+    # stems in more than this share of the recommendable job posts become stopwords,
+    # once there are at least STOPWORD_MIN_JOB_POSTS of them
+    STOPWORD_MAX_DOCUMENT_FREQUENCY: float = 0.5
+    STOPWORD_MIN_JOB_POSTS: int = 200
+    # seconds before a process reloads the stopwords promoted by other processes
+    STOPWORD_REFRESH_SECONDS: float = 300
+
+
+
+keyword_extraction_config = KeywordExtractionConfig()
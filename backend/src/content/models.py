@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Union
 from sqlmodel import SQLModel, Field, Relationship, Column, AutoString, text, TIMESTAMP
+from sqlalchemy import ARRAY, Integer
 from sqlalchemy.dialects.postgresql import JSONB
 from pydantic import field_validator
 from src.utils import validate_website_url
@@ -43,7 +44,9 @@ class Content(ContentBase, table=True):
         sa_column=Column(TIMESTAMP(timezone=True), server_default=text("now()"), 
         onupdate=text("now()")),
     )
-   
+
+    # sorted keyword ids of the text, see src/skill_index.py
+    keyword_ids: Union[list[int], None] = Field(default=None, sa_type=ARRAY(Integer), exclude=True)
 
     groups: list["ContentGroup"] = Relationship(back_populates="content")
     skills: list["ContentSkillTag"] = Relationship(back_populates="content")
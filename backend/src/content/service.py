@@ -12,6 +12,7 @@ from src.content.models import (
 from src.content.exceptions import SkillTagAlreadyAssigned, SkillTagNotAssigned,  ContentAlreadyInGroup, ContentNotInGroup
 from src.crud import create_generic, update_generic, add_skill_to_entity, remove_skill_from_entity
 from src.content.exceptions import ContentNotFound
+from src.skill_index import content_text, extract_entity_keyword_ids
 from src.groups.service import get_group_by_id
 from src.groups.exceptions import GroupNotFound
 
@@ -32,21 +33,26 @@ async def get_content_by_id(content_id: int, session: AsyncSession):
 
 # create content
 async def create_content(content: ContentCreate, session: AsyncSession):
+    keyword_ids = await extract_entity_keyword_ids(session, content_text(content))
     db_content = await create_generic(
         model_class=Content,
         create_data=content,
-        session=session
+        session=session,
+        extra_data={"keyword_ids": keyword_ids}
     )
     return db_content
 
 # update content
 async def update_content(content_id: int, content: ContentUpdate, session: AsyncSession):
-    return await update_generic(
+    db_content = await update_generic(
         model_id=content_id,
         update_data=content,
         model_getter=get_content_by_id,
         session=session
     )
+    if content.model_fields_set & {"title", "content"}:
+        db_content.keyword_ids = await extract_entity_keyword_ids(session, content_text(db_content))
+    return db_content
 
 
 
@@ -5,6 +5,7 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from src.skill_tags.service import get_skill_by_id, get_skill_by_name, create_skill_tag
 from src.exceptions import DetailedHTTPException, NotFound
 from src.skill_tags.exceptions import SkillTagNotFound, SkillNameAndSkillIdBothProvided, SkillNameAndSkillIdNotProvided
+from src.skill_index import refresh_skill_index
 
 
 async def create_generic(
@@ -126,6 +127,7 @@ async def add_skill_to_entity(
     skill_tag.last_used = datetime.now()
     await session.commit()
     await session.refresh(db_skill_tag)
+    refresh_skill_index(skill_tag_base_model, entity_id, db_skill_tag.skill_id)
     return db_skill_tag
 
 # remove skill generic
@@ -146,6 +148,7 @@ async def remove_skill_from_entity(
         raise exception
     await session.delete(db_skill_tag)
     await session.commit()
+    refresh_skill_index(skill_tag_base_model, entity_id, skill_id, removed=True)
     
 
 # add skils straight after creating an entity
@@ -2,6 +2,7 @@ from datetime import datetime, date, time
 from typing import TYPE_CHECKING, Union, Dict, Any
 from enum import Enum
 from sqlmodel import SQLModel, Field, Relationship, AutoString, Column, text, TIMESTAMP
+from sqlalchemy import ARRAY, Integer
 from src.skill_tags.models import AttachedSkillTagBase, SkillTagRead
 from src.skill_tags.models import SkillTag
 from src.models import ConstrainedId, Name, Description
@@ -43,6 +44,9 @@ class Event(EventBase, table=True):
         sa_column=Column(TIMESTAMP(timezone=True), server_default=text("now()")),
     )
 
+    # sorted keyword ids of the text, see src/skill_index.py
+    keyword_ids: Union[list[int], None] = Field(default=None, sa_type=ARRAY(Integer), exclude=True)
+
     students: list["EventRegistration"] = Relationship(back_populates="event")
     skills: list["EventSkillTag"] = Relationship(back_populates="event")
 
@@ -30,6 +30,7 @@ from src.crud import (
 )
 
 from src.models import ConstrainedId
+from src.skill_index import event_text, extract_entity_keyword_ids
 from src.students.models import Student
 from src.skill_tags.service import get_skill_by_id
 from src.skill_tags.exceptions import SkillTagNotFound
@@ -75,7 +76,12 @@ async def create_event(event: EventCreate, session: AsyncSession):
     await validate_skill_tags(skill_data, session=session)
     
 
-    db_event = await create_generic(model_class=Event, create_data=event, session=session)
+    keyword_ids = await extract_entity_keyword_ids(session, event_text(event))
+    db_event = await create_generic(
+        model_class=Event, 
+        create_data=event, 
+        session=session, 
+        extra_data={"keyword_ids": keyword_ids})
     await add_skills_to_entity_on_create(
         entity_id=db_event.id, 
         entity_model=EventSkillTag, 
@@ -94,12 +100,15 @@ async def create_event(event: EventCreate, session: AsyncSession):
 
 # update an event
 async def update_event(event_id: int, event: EventUpdate, session: AsyncSession):
-    return await  update_generic(
+    db_event = await  update_generic(
         model_id=event_id,
         update_data=event,
         model_getter=get_event_by_id,
         session=session
     )
+    if event.model_fields_set & {"name", "description"}:
+        db_event.keyword_ids = await extract_entity_keyword_ids(session, event_text(db_event))
+    return db_event
       
 
 # soft delete event (cancel)
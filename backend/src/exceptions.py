@@ -34,4 +34,9 @@ class NotFound(DetailedHTTPException):
 
 class BadRequest(DetailedHTTPException):
     STATUS_CODE = status.HTTP_400_BAD_REQUEST
-    DETAIL = "Bad Request"
\ No newline at end of file
+    DETAIL = "Bad Request"
+
+
+class ServiceUnavailable(DetailedHTTPException):
+    STATUS_CODE = status.HTTP_503_SERVICE_UNAVAILABLE
+    DETAIL = "Service unavailable"
@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterator, Union
+from sqlmodel import select, update, func, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.database import async_engine
+# imports every model so that the relationships can be resolved
+import src.init_db
+from src.job_posts.models import JobPost, JobPostKeyword, JobType, JobSource, JobPostStatus, Visibility, DegreeRequired
+from src.keyword_extraction import chunked, extract_keyword_weights_batch, warm_up_worker, replace_keywords
+from src.keyword_vocabulary import intern_keyword_batch
+from src.keyword_weights import rebuild_keyword_statistics
+from src.keyword_index import hand_over_duplicates
+from src.minhash import compute_minhash_signature
+from src.simhash import SimHashIndex, compute_simhash, create_simhash_index
+
+
+# Bulk import of the scraped listings in job_data/*.json
+#
+#   python -m src.import_job_data ../job_data/graduate_listings_full.json ../job_data/placement_internship_listings_full.json --workers 4
+#
+# Each file is a JSON array of listings. The arrays are parsed incrementally (one
+# listing at a time from a buffered read) and imported in batches of batch_size, so
+# memory depends on the batch size and not on the size of the files. Listings are
+# mapped onto public, ongoing external job posts, the keywords of a batch are extracted
+# in the worker processes while the previous batch is written, and each batch is
+# written in its own transaction.
+# Re-imports are incremental: job posts are matched to listings on listing_url (unique)
+# and store a hash of the imported fields. New listings are copied in with COPY,
+# changed ones are updated and get their keywords re-extracted, unchanged ones are
+# skipped without extracting anything (closed ones are reopened). New and changed
+# listings are fingerprinted and flagged as near-duplicates of the recommendable job
+# posts (src/simhash.py), including the ones imported earlier in the run. Every listing
+# read stamps its job post's last_seen_at with the start of the run (a listing already
+# stamped by the run was in an earlier file and is skipped, the first one wins). Once
+# every file has been read, the ongoing external job posts of the imported job types
+# left unstamped are closed, unless --keep-missing is given, so pass the complete scrape
+# of a job type.
+# The keyword document frequencies and the job post norms are rebuilt once every file
+# has been imported. Restart the web processes so that they reload their keyword
+# indexes, then recompute the stored recommendations:
+#   python -m src.batch_recommendations
+
+JOB_POST_COLUMNS = [
+    "id", "title", "company_name", "description", "location", "salary", "job_type",
+    "hiring_mutiple_candidates", "degree_required", "deadline", "website_url", "status",
+    "source", "visibility", "minhash_signature", "listing_url", "content_hash", "simhash", "duplicate_of",
+    "last_seen_at",
+]
+JOB_POST_KEYWORD_COLUMNS = ["job_post_id", "keyword_id", "weight"]
+
+# limits of the Name type and the location column
+MAX_NAME_LENGTH = 50
+MAX_LOCATION_LENGTH = 100
+
+# characters a single listing can take in the file, a buffer growing past it without
+# decoding means the file is malformed rather than the listing large
+MAX_ITEM_SIZE = 1 << 24
+
+
+# Objects of a top level JSON array, decoded one at a time as the file is read
+def iter_json_array(
+        path: Union[str, Path], 
+        buffer_size: int = 1 << 16, 
+        max_item_size: int = MAX_ITEM_SIZE) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(buffer_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as error:
+                if len(buffer) > max_item_size:
+                    raise ValueError(
+                        f"{path}: no JSON value could be decoded from {len(buffer)} characters "
+                        f"(more than {max_item_size})") from error
+                more = f.read(buffer_size)
+                if not more:
+                    raise
+                buffer += more
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def truncate(value: str, length: int) -> str:
+    value = value.strip()
+    if len(value) <= length:
+        return value
+    return value[:length].rsplit(" ", 1)[0] or value[:length]
+
+def parse_deadline(value: Union[str, None]) -> Union[date, None]:
+    if not value:
+        return None
+    # e.g. "April 2nd, 2024", anything else ("Ongoing") has no deadline
+    match = re.fullmatch(r"([A-Za-z]+) (\d{1,2})(?:st|nd|rd|th)?, (\d{4})", value.strip())
+    if match is None:
+        return None
+    try:
+        return datetime.strptime(" ".join(match.groups()), "%B %d %Y").date()
+    except ValueError:
+        return None
+
+def parse_degree_required(value: Union[str, None]) -> DegreeRequired:
+    if not value:
+        return DegreeRequired.ALL_GRADES
+    expected = "(expected)" in value
+    if "master" in value.lower():
+        return DegreeRequired.MASTERS
+    if "2:1" in value:
+        return DegreeRequired.TWO_ONE_EXPECTED if expected else DegreeRequired.TWO_ONE
+    if "2:2" in value:
+        return DegreeRequired.TWO_TWO_EXPECTED if expected else DegreeRequired.TWO_TWO
+    if value.startswith("First"):
+        return DegreeRequired.FIRST_EXPECTED if expected else DegreeRequired.FIRST
+    return DegreeRequired.ALL_GRADES
+
+# "Apply for the ... opportunity with <company>", or the company slug of the url
+def parse_company_name(listing: dict) -> str:
+    match = re.search(r"opportunity with (.+)$", listing.get("Description") or "")
+    if match:
+        return match.group(1)
+    match = re.search(r"/hub/\d+/([^/]+)/", listing.get("url") or "")
+    return match.group(1).replace("-", " ").title() if match else "Unknown"
+
+def infer_job_type(path: Union[str, Path]) -> JobType:
+    return JobType.PLACEMENT_INTERNSHIP if "placement" in Path(path).name else JobType.GRADUATE_JOB
+
+def content_hash(job_post: dict) -> str:
+    content = json.dumps(job_post, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+# job_post column values of a listing, None for listings without a url, a title or a body
+def listing_to_job_post(listing: dict, job_type: JobType) -> Union[dict, None]:
+    url = listing.get("url")
+    title = listing.get("title")
+    description = listing.get("body_content") or listing.get("Description")
+    if not url or not title or not description:
+        return None
+    job_post = {
+        "title": truncate(title, MAX_NAME_LENGTH),
+        "company_name": truncate(parse_company_name(listing), MAX_NAME_LENGTH),
+        "description": description,
+        "location": truncate(listing.get("Location") or "Unknown", MAX_LOCATION_LENGTH),
+        "salary": listing.get("Salary"),
+        "job_type": job_type,
+        "hiring_mutiple_candidates": listing.get("Hiring multiple candidates") == "Yes",
+        "degree_required": parse_degree_required(listing.get("Degree required")),
+        # one of the scraped files has the key misspelt
+        "deadline": parse_deadline(listing.get("Deadline") or listing.get("Deadlinr")),
+        "website_url": url,
+    }
+    return {**job_post, "listing_url": url, "content_hash": content_hash(job_post)}
+
+def iter_job_posts(paths: list[str], job_type: Union[JobType, None]) -> Iterator[dict]:
+    for path in paths:
+        for listing in iter_json_array(path):
+            job_post = listing_to_job_post(listing, job_type or infer_job_type(path))
+            if job_post is not None:
+                yield job_post
+
+
+# asyncpg connection of the session's transaction, for COPY
+async def get_driver_connection(session: AsyncSession):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+# ids taken from the job_post sequence up front, so that the keyword rows of the batch
+# can be copied straight after the job posts
+async def allocate_job_post_ids(session: AsyncSession, count: int) -> list[int]:
+    sequence = func.pg_get_serial_sequence(JobPost.__tablename__, "id")
+    result = await session.exec(select(func.nextval(sequence)).select_from(func.generate_series(1, count)))
+    return list(result.all())
+
+# enums are stored by name, like SQLAlchemy does
+def job_post_record(job_post_id: int, job_post: dict, keywords: dict[int, float]):
+    values = {
+        **job_post,
+        "id": job_post_id,
+        "job_type": job_post["job_type"].name,
+        "degree_required": job_post["degree_required"].name,
+        "status": JobPostStatus.ONGOING.name,
+        "source": JobSource.EXTERNAL.name,
+        "visibility": Visibility.PUBLIC.name,
+        "minhash_signature": compute_minhash_signature(keywords),
+    }
+    return tuple(values[column] for column in JOB_POST_COLUMNS)
+
+class ImportBatch:
+    def __init__(self, seen_at: datetime):
+        self.seen_at = seen_at
+        self.new: list[dict] = []
+        # (id, status, listing) of the job posts whose listing has changed
+        self.changed: list[tuple[int, JobPostStatus, dict]] = []
+        self.reopened: list[int] = []
+        self.unchanged: list[int] = []
+
+    @property
+    def listing_urls(self):
+        return {job_post["listing_url"] for job_post in self.new + [job_post for _, _, job_post in self.changed]}
+
+    # the listings whose keywords have to be extracted, new ones first
+    @property
+    def texts(self):
+        return [job_post["description"] for job_post in self.new] + [job_post["description"] for _, _, job_post in self.changed]
+
+# splits the listings of a batch by comparing them with the job posts already imported.
+# Listings seen earlier in the run are skipped, pending_urls are the ones of the previous
+# batch, which isn't written (stamped) yet
+async def plan_batch(
+        session: AsyncSession, 
+        job_posts: list[dict], 
+        seen_at: datetime, 
+        pending_urls: set[str]) -> ImportBatch:
+    result = await session.exec(
+        select(JobPost.listing_url, JobPost.id, JobPost.content_hash, JobPost.status, JobPost.last_seen_at)
+        .where(JobPost.listing_url.in_([job_post["listing_url"] for job_post in job_posts])))
+    existing = {
+        listing_url: (job_post_id, digest, status, last_seen_at) 
+        for listing_url, job_post_id, digest, status, last_seen_at in result.all()}
+
+    batch = ImportBatch(seen_at)
+    seen_urls = set(pending_urls)
+    for job_post in job_posts:
+        if job_post["listing_url"] in seen_urls:
+            continue
+        seen_urls.add(job_post["listing_url"])
+        job_post["last_seen_at"] = seen_at
+        if job_post["listing_url"] not in existing:
+            batch.new.append(job_post)
+            continue
+        job_post_id, digest, status, last_seen_at = existing[job_post["listing_url"]]
+        if last_seen_at is not None and last_seen_at >= seen_at:
+            continue
+        # a listing that is back after being closed by an earlier import is reopened,
+        # job posts removed by staff stay removed
+        if status == JobPostStatus.CLOSED:
+            status = JobPostStatus.ONGOING
+        if digest != job_post["content_hash"]:
+            batch.changed.append((job_post_id, status, job_post))
+        elif status != existing[job_post["listing_url"]][2]:
+            batch.reopened.append(job_post_id)
+        else:
+            batch.unchanged.append(job_post_id)
+    return batch
+
+# fingerprints of the recommendable job posts, for detecting duplicates of them
+async def load_simhash_index(session: AsyncSession) -> Union[SimHashIndex, None]:
+    simhashes = create_simhash_index()
+    if simhashes is None:
+        return None
+    result = await session.exec(
+        select(JobPost.id, JobPost.simhash, JobPost.company_name, JobPost.duplicate_of)
+        .where(
+            JobPost.visibility == Visibility.PUBLIC,
+            JobPost.status == JobPostStatus.ONGOING,
+            JobPost.simhash != None))
+    for job_post_id, simhash, company_name, duplicate_of in result.all():
+        simhashes.insert(job_post_id, simhash, company_name, duplicate_of)
+    return simhashes
+
+# sets the simhash and duplicate_of columns, the job posts are added to the index
+# so that later listings can be flagged as their duplicates
+def fingerprint_job_posts(simhashes: Union[SimHashIndex, None], job_post_ids: list[int], job_posts: list[dict]):
+    for job_post_id, job_post in zip(job_post_ids, job_posts):
+        job_post["simhash"] = compute_simhash(job_post["description"])
+        job_post["duplicate_of"] = None
+        if simhashes is not None and job_post["simhash"] is not None:
+            job_post["duplicate_of"] = simhashes.find_duplicate(
+                job_post["simhash"], job_post["company_name"], exclude=job_post_id)
+            simhashes.insert(job_post_id, job_post["simhash"], job_post["company_name"], job_post["duplicate_of"])
+
+async def copy_job_posts(
+        session: AsyncSession,
+        job_posts: list[dict],
+        keywords: list[dict[int, float]],
+        simhashes: Union[SimHashIndex, None]) -> int:
+    job_post_ids = await allocate_job_post_ids(session, len(job_posts))
+    fingerprint_job_posts(simhashes, job_post_ids, job_posts)
+    driver_connection = await get_driver_connection(session)
+    await driver_connection.copy_records_to_table(
+        JobPost.__tablename__,
+        records=[
+            job_post_record(job_post_id, job_post, job_post_keywords)
+            for job_post_id, job_post, job_post_keywords in zip(job_post_ids, job_posts, keywords)],
+        columns=JOB_POST_COLUMNS)
+    keyword_records = [
+        (job_post_id, keyword_id, weight)
+        for job_post_id, job_post_keywords in zip(job_post_ids, keywords)
+        for keyword_id, weight in job_post_keywords.items()]
+    await driver_connection.copy_records_to_table(
+        JobPostKeyword.__tablename__, records=keyword_records, columns=JOB_POST_KEYWORD_COLUMNS)
+    return len(keyword_records)
+
+async def update_job_posts(
+        session: AsyncSession,
+        changed: list[tuple[int, JobPostStatus, dict]],
+        keywords: list[dict[int, float]],
+        simhashes: Union[SimHashIndex, None]) -> int:
+    fingerprint_job_posts(
+        simhashes, [job_post_id for job_post_id, _, _ in changed], [job_post for _, _, job_post in changed])
+    await session.exec(update(JobPost), params=[
+        {**job_post, "id": job_post_id, "status": status, "minhash_signature": compute_minhash_signature(job_post_keywords)}
+        for (job_post_id, status, job_post), job_post_keywords in zip(changed, keywords)])
+    _, upserted = await replace_keywords(
+        session, "job_post", {job_post_id: job_post_keywords for (job_post_id, _, _), job_post_keywords in zip(changed, keywords)})
+    return upserted
+
+async def write_batch(
+        session: AsyncSession,
+        batch: ImportBatch,
+        extraction: asyncio.Future,
+        simhashes: Union[SimHashIndex, None]) -> int:
+    keywords = await intern_keyword_batch(session, await extraction)
+    keyword_count = 0
+    if batch.new:
+        keyword_count += await copy_job_posts(session, batch.new, keywords[:len(batch.new)], simhashes)
+    if batch.changed:
+        keyword_count += await update_job_posts(session, batch.changed, keywords[len(batch.new):], simhashes)
+    if batch.reopened:
+        await session.exec(
+            update(JobPost)
+            .where(JobPost.id.in_(batch.reopened))
+            .values(status=JobPostStatus.ONGOING, last_seen_at=batch.seen_at))
+    if batch.unchanged:
+        await session.exec(
+            update(JobPost).where(JobPost.id.in_(batch.unchanged)).values(last_seen_at=batch.seen_at))
+    await session.commit()
+    return keyword_count
+
+# ongoing external job posts of the given job types whose listing wasn't seen by the
+# import started at seen_at, the duplicates of the closed job posts are handed over to
+# one of them (rescored by batch_recommendations). Returns the number of closed job
+# posts and of handovers
+async def close_missing_listings(session: AsyncSession, seen_at: datetime, job_types: set[JobType]):
+    result = await session.exec(
+        update(JobPost)
+        .where(
+            JobPost.source == JobSource.EXTERNAL,
+            JobPost.status == JobPostStatus.ONGOING,
+            JobPost.job_type.in_(job_types),
+            JobPost.listing_url.is_not(None),
+            or_(JobPost.last_seen_at == None, JobPost.last_seen_at < seen_at))
+        .values(status=JobPostStatus.CLOSED)
+        .returning(JobPost.id))
+    closed_ids = result.scalars().all()
+    handovers = 0
+    for job_post_ids in chunked(closed_ids, 1000):
+        handovers += len(await hand_over_duplicates(session, job_post_ids))
+    return len(closed_ids), handovers
+
+class ImportProgress:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.reopened = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.keywords = 0
+        self.start = time.perf_counter()
+
+    @property
+    def listings(self):
+        return self.inserted + self.updated + self.reopened + self.unchanged
+
+    def record(self, batch: ImportBatch, keyword_count: int):
+        self.inserted += len(batch.new)
+        self.updated += len(batch.changed)
+        self.reopened += len(batch.reopened)
+        self.unchanged += len(batch.unchanged)
+        self.duplicates += sum(
+            job_post["duplicate_of"] is not None
+            for job_post in batch.new + [job_post for _, _, job_post in batch.changed])
+        self.keywords += keyword_count
+
+    def __str__(self):
+        return (
+            f"{self.listings} listings ({self.listings / (time.perf_counter() - self.start):.0f}/s): "
+            f"{self.inserted} inserted, {self.updated} updated, {self.reopened} reopened, {self.unchanged} unchanged, "
+            f"{self.duplicates} flagged as near-duplicates, {self.keywords} keywords written")
+
+async def import_job_posts(args):
+    progress = ImportProgress()
+    seen_at = datetime.now(timezone.utc)
+    with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context("spawn"),
+            initializer=warm_up_worker) as executor:
+        async with AsyncSession(async_engine) as session:
+            simhashes = await load_simhash_index(session)
+            # the next batch is extracted while the previous one is written
+            previous = None
+            for job_posts in chunked(iter_job_posts(args.files, args.job_type), args.batch_size):
+                pending_urls = previous[0].listing_urls if previous is not None else set()
+                batch = await plan_batch(session, job_posts, seen_at, pending_urls)
+                extraction = asyncio.ensure_future(extract_keyword_weights_batch(executor, batch.texts, args.chunk_size))
+                if previous is not None:
+                    progress.record(previous[0], await write_batch(session, *previous, simhashes))
+                    print(progress)
+                previous = (batch, extraction)
+            if previous is not None:
+                progress.record(previous[0], await write_batch(session, *previous, simhashes))
+            print(f"Imported {progress} in {time.perf_counter() - progress.start:.1f}s")
+
+            if not args.keep_missing and progress.listings:
+                job_types = {args.job_type or infer_job_type(path) for path in args.files}
+                closed, handovers = await close_missing_listings(session, seen_at, job_types)
+                await session.commit()
+                print(
+                    f"Closed {closed} job posts whose listing is no longer in the scrape, "
+                    f"{handovers} of their duplicates took their place")
+
+            document_count, stopwords = await rebuild_keyword_statistics(session)
+            await session.commit()
+    await async_engine.dispose()
+    print(f"Rebuilt the document frequencies and norms of {document_count} recommendable job posts")
+    if stopwords:
+        print(f"New stopwords: {', '.join(sorted(stopwords.values()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import scraped job listings as external job posts")
+    parser.add_argument("files", nargs="+", help="JSON arrays of listings")
+    parser.add_argument(
+        "--job-type", type=JobType, choices=list(JobType), default=None,
+        help="by default placement/internship for files with 'placement' in their name, graduate otherwise")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=500, help="listings extracted and written together")
+    parser.add_argument("--chunk-size", type=int, default=64, help="texts sent to a worker at once")
+    parser.add_argument(
+        "--keep-missing", action="store_true",
+        help="don't close the job posts whose listing isn't in the files (for a partial scrape)")
+    parser.add_argument("--echo", action="store_true", help="log the SQL statements")
+    args = parser.parse_args()
+
+    async_engine.sync_engine.echo = args.echo
+    asyncio.run(import_job_posts(args))
+
+
+if __name__ == "__main__":
+    main()
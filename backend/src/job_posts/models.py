@@ -1,7 +1,8 @@
-from datetime import date
+from datetime import date, datetime
 from typing import TYPE_CHECKING, Union, Dict, Any
 from enum import Enum
-from sqlmodel import SQLModel, Field, Relationship, AutoString 
+from sqlmodel import SQLModel, Field, Relationship, AutoString, LargeBinary, BigInteger, Column, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import JSONB
 from src.skill_tags.models import AttachedSkillTagBase
 from src.models import Name
 from pydantic import field_validator 
@@ -77,6 +78,21 @@ class JobPost(JobPostBase, table=True):
     id: Union[int, None] = Field(primary_key=True, default=None)
     source: JobSource 
     visibility: Visibility = Field(default="private") # This will be used for student job posts
+    # MinHash signature of the keywords, only set when MinHash candidate generation is enabled
+    minhash_signature: Union[bytes, None] = Field(default=None, sa_type=LargeBinary, exclude=True)
+    # norm of the TF-IDF weighted keyword vector, precomputed when the keywords change
+    keyword_norm: Union[float, None] = Field(default=None, exclude=True)
+    # url of the scraped listing an external job post was imported from, re-imports are
+    # matched on it, and a hash of the imported fields to skip the unchanged listings
+    listing_url: Union[str, None] = Field(default=None, unique=True, exclude=True)
+    content_hash: Union[str, None] = Field(default=None, max_length=64, exclude=True)
+    # start of the last import whose files had the listing, the listings not seen by an
+    # import are closed at the end of it
+    last_seen_at: Union[datetime, None] = Field(default=None, sa_type=TIMESTAMP(timezone=True), exclude=True)
+    # SimHash fingerprint of the description and the job post this one is a near-duplicate
+    # of (src/simhash.py), duplicates are collapsed into it in the recommendations
+    simhash: Union[int, None] = Field(default=None, sa_type=BigInteger, exclude=True)
+    duplicate_of: Union[int, None] = Field(default=None, foreign_key="job_post.id", exclude=True)
     
     
     skills: list["JobPostSkillTag"] = Relationship(back_populates="job_post")
@@ -130,14 +146,26 @@ class JobPostSkillTagCreate(AttachedSkillTagBase):
 
 
 
+# Keyword stems are stored once and referenced by id, the association tables and the
+# in-memory indexes work with the integer ids rather than the strings
+class Keyword(SQLModel, table=True):
+    __tablename__ = "keyword"
+    id: Union[int, None] = Field(primary_key=True, default=None)
+    keyword: str = Field(max_length=100, unique=True)
+    # set once the stem appears in too many job posts, see src/keyword_weights.py
+    is_stopword: bool = Field(default=False)
+
+
 class JobPostKeywordBase(SQLModel):
-    keyword: str = Field(max_length=100)
+    keyword_id: int = Field(foreign_key="keyword.id")
 
 
 class JobPostKeyword(JobPostKeywordBase, table=True):
     __tablename__ = "job_post_keyword"
-    id: Union[int, None] = Field(primary_key=True, default=None)
-    job_post_id: int = Field(foreign_key="job_post.id")
+    job_post_id: int = Field(foreign_key="job_post.id", primary_key=True)
+    keyword_id: int = Field(foreign_key="keyword.id", primary_key=True)
+    # TextRank score of the keyword, normalised so the top keyword has a weight of 1
+    weight: float = Field(default=1)
     
     job_post: "JobPost" = Relationship(back_populates="keywords")
 
@@ -148,7 +176,28 @@ class JobPostKeywordRead(JobPostKeywordBase):
     pass
 
 class JobPostKeywordUpdate(SQLModel):
-    keyword: Union[str, None] = None
+    keyword_id: Union[int, None] = None
+
+
+# Number of recommendable (public and ongoing) job posts each keyword appears in,
+# updated incrementally as job posts are created, updated and closed
+class KeywordDocumentFrequency(SQLModel, table=True):
+    __tablename__ = "keyword_document_frequency"
+    keyword_id: int = Field(foreign_key="keyword.id", primary_key=True)
+    job_post_count: int = Field(default=0)
+
+
+# Keywords already extracted from a text, keyed by the hash of the normalised text and
+# the version of the extractor that produced them. last_used orders the rows for eviction.
+class KeywordExtractionCache(SQLModel, table=True):
+    __tablename__ = "keyword_extraction_cache"
+    text_hash: str = Field(primary_key=True, max_length=64)
+    extractor_version: int = Field(primary_key=True)
+    # keyword -> weight
+    keywords: Dict[str, float] = Field(sa_column=Column(JSONB, nullable=False))
+    last_used: Union[datetime, None] = Field(
+        default=None,
+        sa_column=Column(TIMESTAMP(timezone=True), server_default=text("now()"), index=True))
 
 
 class SavedJobPostBase(SQLModel):
@@ -16,6 +16,8 @@ from src.auth.dependencies import get_token_data
 from src.applications.models import JobApplicationCreate, JobApplicationReadWithStudent
 from src.auth.models import User
 from src.job_posts.models import JobSource
+from src.keyword_extraction import keyword_extractor, keyword_extraction_pool, keyword_cache
+from src.keyword_vocabulary import keyword_stopwords
 
 router = APIRouter(dependencies=[Depends(get_current_active_user)])
 
@@ -25,6 +27,21 @@ router = APIRouter(dependencies=[Depends(get_current_active_user)])
 async def read_job_posts(session: AsyncSession = Depends(get_session)):
     return await service.get_job_posts(session=session)
 
+# Careers staff can see how long keyword extraction takes (cold start and per call when
+# the web process extracts itself, the extractor stats are null when the workers do),
+# the queue depth and task durations of the extraction workers and the hit rate of the
+# keyword cache and the number of stopwords derived from the corpus
+@router.get("/keyword-extraction/stats")
+async def get_keyword_extraction_stats(
+    current_user: User = Depends(get_current_active_staff_user),
+):
+    return {
+        "extractor": None if keyword_extraction_pool.enabled else keyword_extractor.stats(), 
+        "pool": keyword_extraction_pool.stats(),
+        "cache": keyword_cache.stats(),
+        "stopwords": keyword_stopwords.stats(),
+    }
+
 # Get a job post by id
 @router.get("/{job_post_id}")
 async def read_job_post(
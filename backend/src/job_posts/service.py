@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Type, Any, Dict
+from typing import Type, Any, Dict, Union
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import SQLModel, select
 from sqlalchemy.orm import selectinload
@@ -35,7 +35,13 @@ from src.job_posts.exceptions import (
 )
 from src.applications.models import JobApplication, JobApplicationCreate
 from src.students.models import Student
-from src.keyword_extraction import extract_keywords, create_keywords, sync_keywords
+from src.keyword_extraction import keyword_cache, normalise_text, create_keywords, sync_keywords, fetch_keywords
+from src.keyword_index import refresh_job_post_index, job_post_index, is_recommendable, get_job_post_keyword_weights, hand_over_duplicates
+from src.keyword_weights import keyword_norm, update_document_frequencies
+from src.minhash import compute_minhash_signature
+from src.simhash import compute_simhash
+from src.recommendations import refresh_job_post_recommendations
+from src.recommendation_cache import recommendation_cache
 
 async def get_job_posts(session: AsyncSession):
     result = await session.exec(select(JobPost).where(JobPost.visibility == Visibility.PUBLIC, JobPost.status == JobPostStatus.ONGOING))
@@ -155,18 +161,56 @@ async def create_job_post(
         return db_job_post
 
 
+# Keep the keyword document frequencies and the job post's TF-IDF norm up to date,
+# previous_keywords are the keywords the job post was counted with before the change
+# (none if it wasn't recommendable)
+# Stopwords are only promoted offline (rebuild_keyword_statistics), promoting one here
+# would change the norms of every job post containing it
+async def update_keyword_statistics(
+        session: AsyncSession,
+        job_post: JobPost,
+        previous_keywords,
+        keywords: Union[dict[int, float], None]):
+    current_keywords = keywords if is_recommendable(job_post) and keywords else {}
+    added_keywords = set(current_keywords) - set(previous_keywords)
+    await update_document_frequencies(
+        session, 
+        set(previous_keywords) - set(current_keywords), 
+        added_keywords)
+    await job_post_index.ensure_loaded(session)
+    if keywords:
+        job_post.keyword_norm = keyword_norm(keywords, job_post_index.idf)
+
+
+# Fingerprint the description and flag the job post as a near-duplicate of a
+# recommendable one, duplicates are collapsed in the recommendations
+async def detect_duplicate_job_post(session: AsyncSession, job_post: JobPost):
+    await job_post_index.ensure_loaded(session)
+    job_post.simhash = compute_simhash(job_post.description)
+    job_post.duplicate_of = job_post_index.find_duplicate(
+        job_post.simhash, job_post.company_name, exclude=job_post.id)
+
+
 async def create_job_post_full(
         session: AsyncSession,
         job_post: JobPostCreate,
         entity_id: ConstrainedId,
         job_source: JobSource,
 ):
+    # extracted first, a busy extraction pool rejects the request before anything is created
+    extracted_keywords = await keyword_cache.extract(session, job_post.description)
     db_job_post = await create_job_post(session, job_post, entity_id, job_source)
     await add_job_post_skills(job_post_id=db_job_post.id, skill_data=job_post.skill_data, session=session)
-    extracted_keywords = extract_keywords(job_post.description)
-    await create_keywords(session, db_job_post.id, "job_post", extracted_keywords)
+    keywords = await create_keywords(session, db_job_post.id, "job_post", extracted_keywords)
+    db_job_post.minhash_signature = compute_minhash_signature(keywords)
+    await detect_duplicate_job_post(session, db_job_post)
+    await update_keyword_statistics(session, db_job_post, [], keywords)
+    await refresh_job_post_recommendations(session, db_job_post, keywords, commit=False)
     await session.commit()
     await session.refresh(db_job_post)
+    await refresh_job_post_index(session, db_job_post, keywords)
+    if is_recommendable(db_job_post):
+        recommendation_cache.invalidate_catalogue()
     return db_job_post
 
 async def check_job_post_ownership(
@@ -191,14 +235,42 @@ async def update_job_post(
     job_post: JobPost,
     update_data: JobPostUpdate
 ):
+    keywords = None
+    was_recommendable = is_recommendable(job_post)
+    previous_keywords = await fetch_keywords(session, job_post.id, "job_post") if was_recommendable else []
     if update_data.description:
-        if update_data.description != job_post.description:
-            await sync_keywords(session, job_post.id, update_data.description, "job_post")
+        if normalise_text(update_data.description) != normalise_text(job_post.description):
+            keywords = await sync_keywords(session, job_post.id, update_data.description, "job_post")
+            job_post.minhash_signature = compute_minhash_signature(keywords)
+    # duplicates are only detected within a company
+    company_changed = update_data.company_name is not None and update_data.company_name != job_post.company_name
     job_post_data = update_data.model_dump(exclude_unset=True)
     job_post.sqlmodel_update(job_post_data)
+    if keywords is not None or company_changed:
+        await detect_duplicate_job_post(session, job_post)
+    if keywords is None and is_recommendable(job_post) and not was_recommendable:
+        keywords = await get_job_post_keyword_weights(session, job_post.id)
+    if keywords is not None or was_recommendable != is_recommendable(job_post):
+        await update_keyword_statistics(session, job_post, previous_keywords, keywords)
     session.add(job_post)
+    # status changes (e.g. closing a job post) add or remove it from the stored
+    # recommendations and the keyword index
+    await refresh_job_post_recommendations(session, job_post, keywords, commit=False)
+    # its duplicates were collapsed into it, one of them takes its place
+    handovers = {}
+    if was_recommendable and not is_recommendable(job_post):
+        handovers = await hand_over_duplicates(session, [job_post.id])
+    replacements = [await get_job_post_by_id(session, job_post_id) for job_post_id in handovers.values()]
+    for replacement in replacements:
+        await refresh_job_post_recommendations(session, replacement, commit=False)
     await session.commit()
     await session.refresh(job_post)
+    await refresh_job_post_index(session, job_post, keywords)
+    job_post_index.hand_over_duplicates(handovers)
+    for replacement in replacements:
+        await session.refresh(replacement)
+        await refresh_job_post_index(session, replacement)
+    recommendation_cache.invalidate_catalogue()
     return job_post
 
 async def delete_job_post(
@@ -273,8 +345,8 @@ async def add_job_post_skill(
     job_post_id: int,
     skill_id: int
 ):
-    await get_job_post_by_id(session=session, job_post_id=job_post_id)
-    await add_skill_to_entity(
+    job_post = await get_job_post_by_id(session=session, job_post_id=job_post_id)
+    db_skill_tag = await add_skill_to_entity(
         skill_tag_base_model=JobPostSkillTag,
         skill_tag_create_model=JobPostSkillTag,
         entity_id=job_post_id,
@@ -283,6 +355,10 @@ async def add_job_post_skill(
         exception=SkillAlreadyAssignedToJobPost,
         session=session
     )
+    # skill tags are part of the recommendation score
+    if db_skill_tag is not None:
+        await session.refresh(job_post)
+        await refresh_job_post_recommendations(session, job_post)
 
 # remove a skill from a job post
 async def remove_job_post_skill(
@@ -298,6 +374,8 @@ async def remove_job_post_skill(
         exception=SkillNotAssignedToJobPost,
         session=session
     )
+    job_post = await get_job_post_by_id(session=session, job_post_id=job_post_id)
+    await refresh_job_post_recommendations(session, job_post)
     
 
 async def get_saved_job_posts(session: AsyncSession, student_id: ConstrainedId):
@@ -3,7 +3,8 @@ from src.job_profiles.models import JobProfileCreate, JobProfileUpdate
 from src.job_profiles import service
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.database import get_session
-from fastapi import Depends
+from fastapi import Depends, Query
+from typing import Annotated
 
 async def validate_job_profile_create(
         job_profile: JobProfileCreate, 
@@ -23,4 +24,24 @@ async def validate_job_profile_update(
 
 async def get_job_profile_by_id(job_profile_id: int, session: AsyncSession = Depends(get_session)):
     job_profile = await service.get_job_profile_by_id(job_profile_id, session=session)
-    return job_profile
\ No newline at end of file
+    return job_profile
+
+
+def job_profile_match_common_params(limit: int = Query(default=5, ge=1, le=20)):
+    return {"limit": limit}
+
+JobProfileMatchCommonsDep = Annotated[dict, Depends(job_profile_match_common_params)]
+
+# pages of students, each with their best fitting profiles_per_student job profiles
+def cohort_job_profile_match_common_params(
+    limit: int = Query(default=50, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+    profiles_per_student: int = Query(default=5, ge=1, le=20)
+):
+    return {
+        "limit": limit,
+        "offset": offset,
+        "profiles_per_student": profiles_per_student
+    }
+
+CohortJobProfileMatchCommonsDep = Annotated[dict, Depends(cohort_job_profile_match_common_params)]
@@ -0,0 +1,83 @@
+import asyncio
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from src.job_profiles.models import JobProfile, JobProfileSkillTag
+
+
+# Dense job profile x skill tag weight matrix of the active job profiles
+# A student is scored against every job profile with one matrix-vector product of the
+# weights and the student's binary skill vector, divided by each profile's total weight,
+# so a profile scores 1 when the student has all of its skill tags. The library holds
+# hundreds of profiles and their skill tags, small enough for a dense float32 matrix.
+# The matrix is built on first use and rebuilt after the job profile service changes
+# a profile or its skill tags.
+
+class JobProfileMatrix:
+    def __init__(self):
+        self.job_profile_ids = np.zeros(0, dtype=np.int64)
+        # skill id -> column
+        self.skill_columns: dict[int, int] = {}
+        self.weights = np.zeros((0, 0), dtype=np.float32)
+        self.total_weights = np.zeros(0, dtype=np.float32)
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.job_profile_ids)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            result = await session.exec(
+                select(JobProfileSkillTag.job_profile_id, JobProfileSkillTag.skill_id, JobProfileSkillTag.weight)
+                .join(JobProfile)
+                .where(JobProfile.is_active == True))
+            self.build(result.all())
+            self.loaded = True
+
+    # skill_weights are (job_profile_id, skill_id, weight) rows
+    def build(self, skill_weights: list[tuple[int, int, float]]):
+        job_profile_ids = sorted({job_profile_id for job_profile_id, _, _ in skill_weights})
+        skill_ids = sorted({skill_id for _, skill_id, _ in skill_weights})
+        rows = {job_profile_id: row for row, job_profile_id in enumerate(job_profile_ids)}
+        self.skill_columns = {skill_id: column for column, skill_id in enumerate(skill_ids)}
+        self.weights = np.zeros((len(job_profile_ids), len(skill_ids)), dtype=np.float32)
+        for job_profile_id, skill_id, weight in skill_weights:
+            self.weights[rows[job_profile_id], self.skill_columns[skill_id]] = weight
+        self.job_profile_ids = np.array(job_profile_ids, dtype=np.int64)
+        self.total_weights = self.weights.sum(axis=1)
+
+    def invalidate(self):
+        self.loaded = False
+
+    # binary skills x students matrix, skill tags no job profile uses are dropped
+    def encode(self, skill_sets: list[set[int]]) -> np.ndarray:
+        vectors = np.zeros((len(self.skill_columns), len(skill_sets)), dtype=np.float32)
+        for column, skill_ids in enumerate(skill_sets):
+            rows = [self.skill_columns[skill_id] for skill_id in skill_ids if skill_id in self.skill_columns]
+            vectors[rows, column] = 1
+        return vectors
+
+    # job profiles x students matrix of the share of each profile's skill weight the student has
+    def score(self, skill_sets: list[set[int]]) -> np.ndarray:
+        overlap = self.weights @ self.encode(skill_sets)
+        return np.divide(
+            overlap,
+            self.total_weights[:, None],
+            out=np.zeros_like(overlap),
+            where=self.total_weights[:, None] > 0)
+
+    # (job_profile_id, score) pairs of the k best scores in a column of score(), ties
+    # are broken by job profile id
+    def top_k(self, scores: np.ndarray, k: int) -> list[tuple[int, float]]:
+        order = np.lexsort((self.job_profile_ids, -scores))[:k]
+        return [
+            (int(self.job_profile_ids[row]), float(scores[row]))
+            for row in order if scores[row] > 0]
+
+
+job_profile_matrix = JobProfileMatrix()
@@ -7,6 +7,7 @@ from annotated_types import Len
 from typing_extensions import Annotated, TypeAliasType
 from pydantic import field_validator
 from src.utils import validate_website_url
+from src.models import ConstrainedId
 from typing import Any, Dict
 
 if TYPE_CHECKING:
@@ -55,6 +56,15 @@ class JobProfileUpdate(SQLModel):
 
     _validate_company_url = field_validator("website_url")(validate_website_url)
 
+# how well a student's skill tags fit a job profile
+class JobProfileMatchRead(SQLModel):
+    job_profile: JobProfileRead
+    score: float
+
+class StudentJobProfileMatchesRead(SQLModel):
+    student_id: ConstrainedId
+    job_profiles: list[JobProfileMatchRead]
+
 
 
 class JobProfileSkillTagBase(SQLModel):
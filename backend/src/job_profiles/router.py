@@ -8,7 +8,8 @@ from src.job_profiles.models import (
     JobProfileRead, 
     JobProfileUpdate,
     JobProfileSkillTagCreate,
-    JobProfileSkillTagRead
+    JobProfileSkillTagRead,
+    StudentJobProfileMatchesRead
 )
 from src.job_profiles import service
 from src.job_profiles.dependencies import (
@@ -19,8 +20,9 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from src.database import get_session
 
 from src.skill_tags.dependencies import valid_active_skill_tag, skill_tag_exists
-from src.job_profiles.dependencies import get_job_profile_by_id
+from src.job_profiles.dependencies import get_job_profile_by_id, CohortJobProfileMatchCommonsDep
 from src.skill_tags.models import SkillTag
+from typing import Union
 
 
 
@@ -31,6 +33,18 @@ router = APIRouter(dependencies=[Depends(get_current_active_user)])
 async def read_job_profiles(session: AsyncSession = Depends(get_session)):
     return await service.get_job_profiles(session=session)
 
+# Careers staff can see the best fitting job profiles of every active student, or of a group's members,
+# a page of students at a time
+@router.get("/student-matches", response_model=list[StudentJobProfileMatchesRead])
+async def read_cohort_job_profile_matches(
+    *,
+    commons: CohortJobProfileMatchCommonsDep,
+    group_id: Union[int, None] = None,
+    current_user: User = Depends(get_current_active_staff_user),
+    session: AsyncSession = Depends(get_session)
+    ):
+    return await service.get_cohort_job_profile_matches(session=session, group_id=group_id, **commons)
+
 # Get a single job profile
 @router.get("/{job_profile_id}", response_model=JobProfileRead)
 async def read_job_profile(
@@ -4,7 +4,17 @@ from src.job_profiles.models import JobProfile, JobProfileCreate, JobProfileUpda
 from src.job_profiles.exceptions import JobProfileNotFound, SkillTagAlreadyAssigned, SkillNotAssignedToJobProfile
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.crud import add_skill_to_entity, remove_skill_from_entity, create_generic, add_skills_to_entity_on_create, update_generic
-from typing import Any, Dict
+from src.job_profiles.matrix import job_profile_matrix
+from src.students.models import Student
+from src.students.exceptions import StudentNotFound
+from src.groups.models import GroupMember
+from src.auth.models import User
+from src.models import ConstrainedId
+from src.recommendations import get_student_skill_ids
+from typing import Any, Dict, Union
+
+# students scored per matrix product when matching a cohort, bounds the memory used for the scores
+COHORT_CHUNK_SIZE = 500
 
 async def get_job_profiles(session: AsyncSession):
     result = await session.exec(select(JobProfile))
@@ -32,6 +42,7 @@ async def soft_delete_job_profile(job_profile_id: int, session: AsyncSession):
     job_profile.is_active = False
     session.add(job_profile)
     await session.commit()
+    job_profile_matrix.invalidate()
     await session.refresh(job_profile)
     return job_profile
 
@@ -72,7 +83,7 @@ async def add_skill_to_job_profile(
     session=session,
     weight=job_profile_skill_tag.weight
 )
-    
+    job_profile_matrix.invalidate()
     return await get_job_profile_by_id(job_profile_id, session=session)
 
 
@@ -89,6 +100,7 @@ async def remove_skill_from_job_profile(
         exception=SkillNotAssignedToJobProfile,
         session=session
     )
+    job_profile_matrix.invalidate()
     return await get_job_profile_by_id(job_profile_id, session=session)
 
 async def add_job_profile_skills(
@@ -102,6 +114,7 @@ async def add_job_profile_skills(
         foreign_key="job_profile_id",
         session=session
     )
+    job_profile_matrix.invalidate()
     return await get_job_profile_by_id(job_profile_id, session=session)
 
 async def create_job_profile(job_profile: JobProfileCreate, session: AsyncSession):
@@ -126,4 +139,66 @@ async def update_job_profile(job_profile_id: int, job_profile: JobProfileUpdate,
         model_getter=get_job_profile_by_id,
         session=session
         )
-    
+
+
+# Job profile matching
+# Students are scored against every active job profile on the share of the profile's
+# skill tag weight they have, using the dense weight matrix in src/job_profiles/matrix.py
+
+async def get_job_profile_matches(
+        session: AsyncSession, 
+        job_profile_scores: list[list[tuple[int, float]]]):
+    job_profile_ids = {job_profile_id for scores in job_profile_scores for job_profile_id, _ in scores}
+    if not job_profile_ids:
+        return [[] for _ in job_profile_scores]
+    result = await session.exec(select(JobProfile).where(JobProfile.id.in_(job_profile_ids)))
+    job_profiles = {job_profile.id: job_profile for job_profile in result.all()}
+    return [
+        [
+            {"job_profile": job_profiles[job_profile_id], "score": score} 
+            for job_profile_id, score in scores if job_profile_id in job_profiles]
+        for scores in job_profile_scores]
+
+# The job profiles that best fit a student's skill tags
+async def get_student_job_profile_matches(session: AsyncSession, student_id: ConstrainedId, limit: int = 5):
+    student = await session.get(Student, student_id)
+    if student is None:
+        raise StudentNotFound()
+    await job_profile_matrix.ensure_loaded(session)
+    student_skills = await get_student_skill_ids(session, [student_id])
+    scores = job_profile_matrix.score([student_skills.get(student_id, set())])
+    matches = await get_job_profile_matches(session, [job_profile_matrix.top_k(scores[:, 0], limit)])
+    return matches[0]
+
+# The best fitting job profiles of every active student, or of the members of a group,
+# for a page of the students in id order
+async def get_cohort_job_profile_matches(
+        session: AsyncSession, 
+        group_id: Union[int, None] = None, 
+        limit: int = 50,
+        offset: int = 0,
+        profiles_per_student: int = 5):
+    query = (
+        select(Student.id)
+        .join(User, Student.user_id == User.id)
+        .where(User.disabled == False)
+        .order_by(Student.id))
+    if group_id is not None:
+        query = query.join(GroupMember, GroupMember.student_id == Student.id).where(GroupMember.group_id == group_id)
+    # only the page of students is scored
+    result = await session.exec(query.offset(offset).limit(limit))
+    student_ids = result.all()
+    if not student_ids:
+        return []
+
+    await job_profile_matrix.ensure_loaded(session)
+    student_skills = await get_student_skill_ids(session, student_ids)
+    job_profile_scores = []
+    for start in range(0, len(student_ids), COHORT_CHUNK_SIZE):
+        chunk = student_ids[start:start + COHORT_CHUNK_SIZE]
+        scores = job_profile_matrix.score([student_skills.get(student_id, set()) for student_id in chunk])
+        job_profile_scores.extend(job_profile_matrix.top_k(scores[:, column], profiles_per_student) for column in range(len(chunk)))
+    matches = await get_job_profile_matches(session, job_profile_scores)
+    return [
+        {"student_id": student_id, "job_profiles": student_matches} 
+        for student_id, student_matches in zip(student_ids, matches)]
@@ -1,15 +1,31 @@
+import asyncio
+import hashlib
+import re
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk import pos_tag
+from nltk.tokenize import sent_tokenize, NLTKWordTokenizer
+from nltk.tag.perceptron import PerceptronTagger
 from nltk.stem import PorterStemmer
-import networkx as nx
-from collections import Counter
+import numpy as np
+from scipy import sparse
+from collections import Counter, deque
+from itertools import islice
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.job_posts.models import JobPostKeyword
+from sqlalchemy import func, tuple_, exists, bindparam, Integer, Float
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from src.job_posts.models import JobPostKeyword, KeywordExtractionCache
 from src.students.models import StudentKeyword
-from sqlmodel import select, delete
-from typing import Union
+from src.keyword_vocabulary import intern_keywords
+from sqlmodel import select, delete, update
+from typing import Union, Iterable, Iterator
 from src.models import ConstrainedId
+from src.config import keyword_extraction_config
+from src.exceptions import ServiceUnavailable
 
 
 
@@ -19,88 +35,545 @@ custom_stopwords = {'candidate', 'experience', 'work', 'working', 'field', 'proj
                     'area', 'graduate', 'scheme', 'role', 'team', 'skill', 'skills', 'knowledge', 'ability', 'company', 'business', 
                     'service', 'industry', 'year', 'month', 'week', 'day', 'time', 'position', 'level', 'qualification'}
 
-def preprocess_text(
-        text: str, 
-        allowed_pos: list = ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'VBG', 'VB', 'VBD'],
-        custom_stopwords: set = custom_stopwords):
-    stop_words = set(stopwords.words('english'))
-    stop_words.update(custom_stopwords)
-    sentences = sent_tokenize(text)
-    words = [word_tokenize(sentence) for sentence in sentences]
-    filtered_words = [[word for word in sentence if word.lower() not in stop_words and word.isalnum()] for sentence in words]
-    tagged_words = [pos_tag(sentence) for sentence in filtered_words]
-    filtered_pos_words = [[word for word, pos in sentence if pos in allowed_pos] for sentence in tagged_words]
-    stemmer = PorterStemmer()
-    stemmed_words = [[stemmer.stem(word) for word in sentence] for sentence in filtered_pos_words]
-    return stemmed_words
-
-
-def compute_text_rank(words, window_size=5):
-    graph = nx.Graph()
-    for sentence in words:
-        for i, word in enumerate(sentence):
-            for j in range(i+1, min(i+window_size, len(sentence))):
-                graph.add_edge(word, sentence[j])
-    return nx.pagerank(graph)
+# distinct words whose stems are kept, least recently used first out
+STEM_CACHE_SIZE = 50000
 
+# Loads the NLTK resources once (stopwords, sentence and word tokenizers, POS tagger and
+# stemmer) and memoises up to STEM_CACHE_SIZE stems, nltk.pos_tag and word_tokenize look
+# their models up on every call. warm_up() is called when a process starts extracting
+# (the web process when the extraction pool is disabled, each worker otherwise) so the
+# first extraction doesn't pay for reading the models from disk. stats() exposes the cold
+# start, the per-call timings and the stem cache of the extractor of the calling process
+# only, the web process doesn't report them when the workers do the extraction.
+class KeywordExtractor:
+    def __init__(
+            self,
+            allowed_pos: list = ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'VBG', 'VB', 'VBD'],
+            custom_stopwords: set = custom_stopwords):
+        self.allowed_pos = set(allowed_pos)
+        self.custom_stopwords = custom_stopwords
+        self.stop_words: set[str] = set()
+        self.word_tokenizer = None
+        self.tagger = None
+        self.stemmer = None
+        self.stem = lru_cache(maxsize=STEM_CACHE_SIZE)(self.stem_word)
+        self.loaded = False
+        self.load_seconds: Union[float, None] = None
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds: Union[float, None] = None
 
-def extract_keywords(text):
+    def load(self):
+        if self.loaded:
+            return
+        start = time.perf_counter()
+        self.stop_words = set(stopwords.words('english')) | self.custom_stopwords
+        self.word_tokenizer = NLTKWordTokenizer()
+        self.tagger = PerceptronTagger()
+        self.stemmer = PorterStemmer()
+        # sent_tokenize keeps the punkt model it loads, tokenizing once loads it now
+        sent_tokenize("Warm up the sentence tokenizer.")
+        self.loaded = True
+        self.load_seconds = time.perf_counter() - start
+
+    # loads the resources and runs the whole pipeline once, the timing isn't recorded
+    def warm_up(self):
+        self.load()
+        compute_text_rank(self.preprocess("Warm up the keyword extractor with a short job description."))
+
+    # called through the memoised self.stem
+    def stem_word(self, word: str) -> str:
+        return self.stemmer.stem(word)
+
+    # sentences of stemmed words, stopwords and words outside allowed_pos are dropped
+    def preprocess(self, text: str) -> list[list[str]]:
+        return self.preprocess_many([text])[0]
+
+    # the sentences of all the texts are tagged in one tag_sents call
+    def preprocess_many(self, texts: list[str]) -> list[list[list[str]]]:
+        self.load()
+        sentence_counts = []
+        filtered_words = []
+        for text in texts:
+            sentences = [self.word_tokenizer.tokenize(sentence) for sentence in sent_tokenize(text)]
+            sentence_counts.append(len(sentences))
+            filtered_words.extend(
+                [word for word in sentence if word.lower() not in self.stop_words and word.isalnum()] 
+                for sentence in sentences)
+        tagged_words = self.tagger.tag_sents(filtered_words)
+        stemmed_words = [[self.stem(word) for word, pos in sentence if pos in self.allowed_pos] for sentence in tagged_words]
+        documents = []
+        start = 0
+        for count in sentence_counts:
+            documents.append(stemmed_words[start:start + count])
+            start += count
+        return documents
+
+    def keyword_weights(self, text: str) -> dict[str, float]:
+        return self.keyword_weights_many([text])[0]
+
+    def keyword_weights_many(self, texts: list[str]) -> list[dict[str, float]]:
+        start = time.perf_counter()
+        keywords = [
+            top_keywords(compute_text_rank(words), len(text)) 
+            for text, words in zip(texts, self.preprocess_many(texts))]
+        elapsed = time.perf_counter() - start
+        if texts:
+            self.calls += len(texts)
+            self.total_seconds += elapsed
+            self.last_seconds = elapsed / len(texts)
+            self.max_seconds = max(self.max_seconds, self.last_seconds)
+        return keywords
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "calls": self.calls,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else None,
+            "max_seconds": self.max_seconds,
+            "last_seconds": self.last_seconds,
+            "stem_cache_size": self.stem.cache_info().currsize,
+        }
+
+
+keyword_extractor = KeywordExtractor()
+
+
+def preprocess_text(text: str):
+    return keyword_extractor.preprocess(text)
+
+
+# TextRank: PageRank over the co-occurrence graph of the stems, computed with a scipy
+# sparse matrix and numpy power iteration. It follows networkx.pagerank on the
+# undirected, unweighted graph the stems used to be added to: nodes are numbered in
+# order of first appearance (sentences of a single word add no node), words within
+# window_size of each other share one edge however often they co-occur, and the same
+# damping, start vector and convergence test are used so the ranking is unchanged.
+def compute_text_rank(words, window_size=5, alpha=0.85, max_iter=100, tol=1.0e-6):
+    vocabulary = {}
+    word_ids = []
+    sentence_ids = []
+    for sentence_number, sentence in enumerate(words):
+        if len(sentence) < 2:
+            continue
+        word_ids.extend(vocabulary.setdefault(word, len(vocabulary)) for word in sentence)
+        sentence_ids.extend([sentence_number] * len(sentence))
+    n = len(vocabulary)
+    if n == 0:
+        return {}
+
+    word_ids = np.array(word_ids)
+    sentence_ids = np.array(sentence_ids)
+    rows = []
+    cols = []
+    for distance in range(1, window_size):
+        same_sentence = sentence_ids[:-distance] == sentence_ids[distance:]
+        rows.append(word_ids[:-distance][same_sentence])
+        cols.append(word_ids[distance:][same_sentence])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    adjacency = sparse.csr_array(
+        (np.ones(2 * len(rows)), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), 
+        shape=(n, n))
+    # an edge counts once however many times the words co-occur
+    adjacency.data[:] = 1.0
+    # every node has an edge so there are no dangling nodes, rows are normalised to sum to 1
+    transition = sparse.dia_array((1.0 / adjacency.sum(axis=1), 0), shape=(n, n)).tocsr() @ adjacency
+
+    x = np.repeat(1.0 / n, n)
+    p = np.repeat(1.0 / n, n)
+    for _ in range(max_iter):
+        x_last = x
+        x = alpha * (x @ transition) + (1 - alpha) * p
+        if np.absolute(x - x_last).sum() < n * tol:
+            break
+    return dict(zip(vocabulary, map(float, x)))
+
+
+# keyword -> TextRank score of the top keywords, normalised so the top keyword has a weight of 1
+def top_keywords(text_rank: dict[str, float], text_len: int) -> dict[str, float]:
     # dynamically decide the number of keywords to extract based on the length of the text
-    text_len = len(text)
     if text_len < 100:
         top_n = 5
     elif text_len < 300:
         top_n = 10
     else:
         top_n = 15
+    top_scores = Counter(text_rank).most_common(top_n)
+    if not top_scores:
+        return {}
+    max_score = top_scores[0][1]
+    return {word: score / max_score for word, score in top_scores}
 
-    words = preprocess_text(text)
-    text_rank = compute_text_rank(words)
-    return [word for word, score in Counter(text_rank).most_common(top_n)]
 
-async def fetch_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], entity_type: str):
-    if entity_type == "job_post":
+def extract_keyword_weights(text) -> dict[str, float]:
+    return keyword_extractor.keyword_weights(text)
+
+
+def extract_keywords(text):
+    return list(extract_keyword_weights(text))
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def extract_keyword_weights_chunk(texts: list[str]) -> list[dict[str, float]]:
+    return keyword_extractor.keyword_weights_many(texts)
+
+
+# Keyword extraction for bulk workloads (imports, reindexing, seeding): texts are read
+# lazily in chunks of chunk_size, each chunk is preprocessed and tagged together and the
+# keyword dicts are yielded in the order of the texts. With processes > 1 the chunks are
+# extracted in worker processes, at most two chunks per worker are in flight so memory
+# stays bounded however many texts there are.
+def extract_keyword_weights_many(
+        texts: Iterable[str], 
+        processes: int = 1, 
+        chunk_size: int = 64) -> Iterator[dict[str, float]]:
+    chunks = chunked(texts, chunk_size)
+    if processes <= 1:
+        for chunk in chunks:
+            yield from keyword_extractor.keyword_weights_many(chunk)
+        return
+    with ProcessPoolExecutor(
+            max_workers=processes, 
+            mp_context=get_context("spawn"), 
+            initializer=warm_up_worker) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(extract_keyword_weights_chunk, chunk))
+            if len(pending) >= 2 * processes:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def extract_keywords_many(texts: Iterable[str], processes: int = 1, chunk_size: int = 64) -> Iterator[list[str]]:
+    for keywords in extract_keyword_weights_many(texts, processes=processes, chunk_size=chunk_size):
+        yield list(keywords)
+
+
+# Async variant for commands that already run an event loop and own a process pool
+# (src/reindex_keywords.py, src/import_job_data.py): the chunks of one batch are
+# extracted in parallel, keyword dicts are returned in the order of the texts
+async def extract_keyword_weights_batch(
+        executor: ProcessPoolExecutor, 
+        texts: list[str], 
+        chunk_size: int = 64) -> list[dict[str, float]]:
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(executor, extract_keyword_weights_chunk, chunk)
+        for chunk in chunked(texts, chunk_size)))
+    return [keywords for chunk in chunks for keywords in chunk]
+
+
+# Keyword extraction (tokenising, POS tagging and PageRank) is CPU bound and would block
+# the event loop, the async services run it in a pool of worker processes instead.
+# The pool fails fast rather than degrading the web process: at most queue_limit
+# extractions are submitted at once and further ones are rejected straight away, and
+# an extraction without a result within the timeout (or one the pool broke on) is given
+# up. Either way KeywordExtractionUnavailable (503) is raised so the client retries,
+# callers extract before writing anything so nothing is stored without its keywords.
+# An extraction that timed out is cancelled if it hasn't started yet, otherwise it
+# keeps its slot until the worker finishes it.
+
+class KeywordExtractionUnavailable(ServiceUnavailable):
+    DETAIL = "Keyword extraction is busy, please try again shortly"
+    RETRY_AFTER_SECONDS = 5
+
+    def __init__(self):
+        super().__init__(headers={"Retry-After": str(self.RETRY_AFTER_SECONDS)})
+
+
+class KeywordExtractionPool:
+    def __init__(self, workers: int, queue_limit: int, timeout: float):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.executor: Union[ProcessPoolExecutor, None] = None
+        self.running = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    # The executor only spawns a worker when work is submitted, so every worker is given
+    # a warm up to start it and load the NLTK resources before the pool takes requests
+    async def start(self):
+        if not self.enabled or self.executor is not None:
+            return
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=warm_up_worker)
+        await asyncio.gather(*(
+            asyncio.wrap_future(self.executor.submit(warm_up_worker)) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    # called from the executor's thread once the worker is done with an extraction
+    def release(self, loop: asyncio.AbstractEventLoop):
+        def release_slot():
+            self.running = max(0, self.running - 1)
+        try:
+            loop.call_soon_threadsafe(release_slot)
+        except RuntimeError:
+            # the event loop has been closed
+            pass
+
+    def broken(self):
+        # a worker died, the next extraction starts a new pool
+        self.failures += 1
+        self.shutdown()
+        return KeywordExtractionUnavailable()
+
+    async def extract(self, text: str) -> dict[str, float]:
+        if not self.enabled:
+            return await asyncio.to_thread(extract_keyword_weights, text)
+        # restarts a pool that broke, the requests meanwhile queue behind the warm ups
+        try:
+            await self.start()
+        except BrokenProcessPool:
+            raise self.broken()
+        if self.running >= self.queue_limit:
+            self.rejected += 1
+            raise KeywordExtractionUnavailable()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            future = self.executor.submit(extract_keyword_weights, text)
+        except BrokenProcessPool:
+            raise self.broken()
+        self.running += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.running)
+        future.add_done_callback(lambda _: self.release(loop))
+        try:
+            # cancelling the wrapper cancels the extraction if no worker has started it
+            keywords = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise KeywordExtractionUnavailable()
+        except BrokenProcessPool:
+            raise self.broken()
+        elapsed = time.perf_counter() - start
+        self.completed += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        return keywords
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "timeout": self.timeout,
+            "queue_depth": self.running,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "mean_seconds": self.total_seconds / self.completed if self.completed else None,
+            "max_seconds": self.max_seconds,
+        }
+
+
+# runs in every worker process when it starts
+def warm_up_worker():
+    keyword_extractor.warm_up()
+
+
+keyword_extraction_pool = KeywordExtractionPool(
+    keyword_extraction_config.KEYWORD_EXTRACTION_WORKERS,
+    keyword_extraction_config.KEYWORD_EXTRACTION_QUEUE_LIMIT,
+    keyword_extraction_config.KEYWORD_EXTRACTION_TIMEOUT)
+
+
+# extract_keyword_weights without blocking the event loop
+async def extract_keyword_weights_async(text: str) -> dict[str, float]:
+    return await keyword_extraction_pool.extract(text)
+
+
+# Bump when a change to the extraction pipeline changes its output, cached keywords from
+# other versions are ignored and pruned
+KEYWORD_EXTRACTOR_VERSION = 1
+
+# extractions cached between prunes of the cache table
+KEYWORD_CACHE_PRUNE_INTERVAL = 100
+
+
+# texts differing only in whitespace give the same keywords
+def normalise_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalise_text(text).encode()).hexdigest()
+
+
+# Persistent cache of extracted keywords in the keyword_extraction_cache table, scraped
+# listings and company posts often reuse the same description. Rows are used in LRU order
+# and the least recently used ones beyond max_rows are deleted every
+# KEYWORD_CACHE_PRUNE_INTERVAL insertions. The rows are written in the caller's
+# transaction, the hit and miss counters are per process.
+class KeywordCache:
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.insertions_since_prune = 0
+        self.pruned = 0
+
+    @property
+    def enabled(self):
+        return self.max_rows > 0
+
+    async def extract(self, session: AsyncSession, text: str) -> dict[str, float]:
+        if not self.enabled:
+            return await extract_keyword_weights_async(text)
+        key = (text_hash(text), KEYWORD_EXTRACTOR_VERSION)
+        is_key = (KeywordExtractionCache.text_hash == key[0], KeywordExtractionCache.extractor_version == key[1])
+        result = await session.exec(select(KeywordExtractionCache.keywords).where(*is_key))
+        cached = result.first()
+        if cached is not None:
+            self.hits += 1
+            await session.exec(update(KeywordExtractionCache).where(*is_key).values(last_used=func.now()))
+            return dict(cached)
+
+        self.misses += 1
+        keywords = await extract_keyword_weights_async(text)
+        # another request may have cached the same text in the meantime
+        await session.exec(
+            insert(KeywordExtractionCache)
+            .values(text_hash=key[0], extractor_version=key[1], keywords=keywords)
+            .on_conflict_do_nothing())
+        self.insertions_since_prune += 1
+        if self.insertions_since_prune >= KEYWORD_CACHE_PRUNE_INTERVAL:
+            await self.prune(session)
+        return keywords
+
+    async def prune(self, session: AsyncSession):
+        self.insertions_since_prune = 0
         result = await session.exec(
-            select(JobPostKeyword.keyword)
-            .where(JobPostKeyword.job_post_id == entity_id))
-    else:
+            delete(KeywordExtractionCache)
+            .where(KeywordExtractionCache.extractor_version != KEYWORD_EXTRACTOR_VERSION))
+        pruned = result.rowcount
+        least_recently_used = (
+            select(KeywordExtractionCache.text_hash, KeywordExtractionCache.extractor_version)
+            .order_by(KeywordExtractionCache.last_used.desc())
+            .offset(self.max_rows))
         result = await session.exec(
-            select(StudentKeyword.keyword)
-            .where(StudentKeyword.student_id == entity_id))
-    
-    return result.all() 
+            delete(KeywordExtractionCache)
+            .where(tuple_(KeywordExtractionCache.text_hash, KeywordExtractionCache.extractor_version).in_(least_recently_used)))
+        self.pruned += pruned + result.rowcount
 
-async def create_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], entity_type: str, keywords: list[str]):
-    if entity_type == "job_post":
-        entires = [JobPostKeyword(job_post_id=entity_id, keyword=keyword) for keyword in keywords]
-    else:
-        entires = [StudentKeyword(student_id=entity_id, keyword=keyword) for keyword in keywords]
-    session.add_all(entires)
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "max_rows": self.max_rows,
+            "extractor_version": KEYWORD_EXTRACTOR_VERSION,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "pruned": self.pruned,
+        }
 
 
-async def delete_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], entity_type: str, keywords: list[str]):
-    if entity_type == "job_post":
-        await session.exec(
-            delete(JobPostKeyword)
-            .where(JobPostKeyword.job_post_id == entity_id, JobPostKeyword.keyword.in_(keywords)))
-    else:
-        await session.exec(
-            delete(StudentKeyword)
-            .where(StudentKeyword.student_id == entity_id, StudentKeyword.keyword.in_(keywords)))
+keyword_cache = KeywordCache(keyword_extraction_config.KEYWORD_CACHE_MAX_ROWS)
 
-async def sync_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], new_text: str, entity_type: str):
-    current_keywords = await fetch_keywords(session, entity_id, entity_type)
-    new_keywords = extract_keywords(new_text)
 
-    keywords_to_remove = set(current_keywords) - set(new_keywords)
-    keywords_to_add = set(new_keywords) - set(current_keywords)
+def keyword_table(entity_type: str):
+    if entity_type == "job_post":
+        return JobPostKeyword, JobPostKeyword.job_post_id
+    return StudentKeyword, StudentKeyword.student_id
 
-    if keywords_to_remove:
-        await delete_keywords(session, entity_id, entity_type, keywords_to_remove)
-    if keywords_to_add:
-        await create_keywords(session, entity_id, entity_type, keywords_to_add)
-        
-        
 
+async def fetch_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], entity_type: str):
+    model, entity_column = keyword_table(entity_type)
+    result = await session.exec(
+        select(model.keyword_id)
+        .where(entity_column == entity_id))
+    return result.all() 
 
+# Replace the keywords of a set of entities in one statement
+# entity_keywords is entity id -> {keyword id: weight}, an entity mapped to an empty dict
+# loses all of its keywords. The new rows are passed as three arrays and unnested, the
+# data-modifying CTEs then delete the rows that aren't in them and upsert the rest
+# (changed weights are updated in place, unchanged rows aren't written). Both CTEs run
+# against the same snapshot and touch disjoint rows. Returns the number of rows deleted
+# and the number inserted or reweighted.
+async def replace_keywords(
+        session: AsyncSession, 
+        entity_type: str, 
+        entity_keywords: dict[Union[str, ConstrainedId, int], dict[int, float]]):
+    if not entity_keywords:
+        return 0, 0
+    model, entity_column = keyword_table(entity_type)
+    rows = [
+        (entity_id, keyword_id, weight) 
+        for entity_id, keywords in entity_keywords.items() 
+        for keyword_id, weight in keywords.items()]
+    new_keywords = (
+        select(
+            func.unnest(
+                bindparam("entity_ids", [row[0] for row in rows], type_=ARRAY(entity_column.type)),
+                bindparam("keyword_ids", [row[1] for row in rows], type_=ARRAY(Integer)),
+                bindparam("weights", [row[2] for row in rows], type_=ARRAY(Float)))
+            .table_valued("entity_id", "keyword_id", "weight")
+            .render_derived(with_types=False))
+        .cte("new_keywords"))
+    new_rows = select(new_keywords.c.entity_id, new_keywords.c.keyword_id, new_keywords.c.weight)
+    deleted = (
+        delete(model)
+        .where(
+            entity_column.in_(list(entity_keywords)),
+            ~exists().where(
+                new_keywords.c.entity_id == entity_column, 
+                new_keywords.c.keyword_id == model.keyword_id))
+        .returning(model.keyword_id)
+        .cte("deleted_keywords"))
+    upsert = insert(model).from_select([entity_column.name, "keyword_id", "weight"], new_rows)
+    upserted = (
+        upsert
+        .on_conflict_do_update(
+            index_elements=[entity_column.name, "keyword_id"], 
+            set_={"weight": upsert.excluded.weight},
+            where=model.weight != upsert.excluded.weight)
+        .returning(model.keyword_id)
+        .cte("upserted_keywords"))
+    result = await session.exec(
+        select(
+            select(func.count()).select_from(deleted).scalar_subquery(),
+            select(func.count()).select_from(upserted).scalar_subquery()))
+    return tuple(result.one())
 
+# keywords can be a list (every keyword gets a weight of 1) or a stem -> weight dict,
+# the stems are interned and the keyword id -> weight dict is returned
+async def create_keywords(
+        session: AsyncSession, 
+        entity_id: Union[str, ConstrainedId], 
+        entity_type: str, 
+        keywords: Union[list[str], dict[str, float]]):
+    if not isinstance(keywords, dict):
+        keywords = {keyword: 1.0 for keyword in keywords}
+    keywords = await intern_keywords(session, keywords)
+    await replace_keywords(session, entity_type, {entity_id: keywords})
+    return keywords
+
+# returns the new keyword id -> weight dict
+async def sync_keywords(session: AsyncSession, entity_id: Union[str, ConstrainedId], new_text: str, entity_type: str):
+    new_keywords = await intern_keywords(session, await keyword_cache.extract(session, new_text))
+    await replace_keywords(session, entity_type, {entity_id: new_keywords})
+    return new_keywords
@@ -0,0 +1,282 @@
+import asyncio
+from collections import defaultdict, Counter
+from typing import Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, func
+from sqlmodel import select, update
+from src.job_posts.models import JobPost, JobPostKeyword, JobPostStatus, Visibility, DegreeRequired
+from src.config import recommendation_config
+from src.minhash import LSHIndex, minhasher, signature_from_bytes
+from src.simhash import SimHashIndex, create_simhash_index
+from src.keyword_weights import inverse_document_frequency, keyword_norm
+from src.keyword_vocabulary import keyword_stopwords
+
+
+# In-memory inverted index of keyword id -> job post ids for the job posts that can be
+# recommended (public and ongoing). Recommendations only need to score the posts that
+# share at least one keyword with the student, so the posting lists let us skip
+# the rest of the catalogue entirely.
+# The index is loaded lazily on first use and then kept up to date by the job post
+# service whenever a job post is created, updated or closed.
+# When MinHash is enabled the index also keeps an LSH banding index of the job post
+# signatures, used to generate approximate candidates for very large catalogues.
+# The length of a posting list is the document frequency of its keyword, which gives
+# the IDF part of the TF-IDF weights without another query.
+# Stopwords (src/keyword_vocabulary.py) are left out of the index and ignored when
+# looking up candidates, the ones promoted by another process stay in the posting lists
+# until the index is reloaded.
+# The SimHash fingerprints of the job posts are indexed too (src/simhash.py), new job
+# posts are checked against the ones of the same company for near-duplicates. A duplicate is never a candidate
+# while the job post it duplicates is in the index, so a role posted several times is
+# only recommended once. When that job post stops being recommendable its duplicates
+# are handed over to the oldest recommendable one (hand_over_duplicates).
+
+def is_recommendable(job_post: JobPost):
+    return job_post.visibility == Visibility.PUBLIC and job_post.status == JobPostStatus.ONGOING
+
+
+class JobPostKeywordIndex:
+    def __init__(self):
+        self.postings: dict[int, set[int]] = defaultdict(set)
+        # job post id -> {keyword id: weight}
+        self.job_post_keywords: dict[int, dict[int, float]] = {}
+        self.job_post_norms: dict[int, float] = {}
+        self.job_post_degree_required: dict[int, DegreeRequired] = {}
+        self.lsh: Union[LSHIndex, None] = None
+        if recommendation_config.MINHASH_ENABLED:
+            self.lsh = LSHIndex(recommendation_config.MINHASH_BANDS, recommendation_config.MINHASH_ROWS)
+        self.simhashes: Union[SimHashIndex, None] = create_simhash_index()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.job_post_keywords)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            await keyword_stopwords.ensure_loaded(session)
+            result = await session.exec(
+                select(
+                    JobPostKeyword.job_post_id, 
+                    JobPostKeyword.keyword_id, 
+                    JobPostKeyword.weight, 
+                    JobPost.degree_required,
+                    JobPost.keyword_norm,
+                    JobPost.simhash,
+                    JobPost.company_name,
+                    JobPost.duplicate_of)
+                .join(JobPost)
+                .where(JobPost.visibility == Visibility.PUBLIC, JobPost.status == JobPostStatus.ONGOING))
+            job_post_keywords = defaultdict(dict)
+            degree_required = {}
+            norms = {}
+            simhashes = {}
+            for job_post_id, keyword_id, weight, degree, norm, simhash, company_name, duplicate_of in result.all():
+                job_post_keywords[job_post_id][keyword_id] = weight
+                degree_required[job_post_id] = degree
+                norms[job_post_id] = norm
+                simhashes[job_post_id] = (simhash, company_name, duplicate_of)
+            signatures = {}
+            if self.lsh is not None:
+                result = await session.exec(
+                    select(JobPost.id, JobPost.minhash_signature)
+                    .where(
+                        JobPost.visibility == Visibility.PUBLIC, 
+                        JobPost.status == JobPostStatus.ONGOING,
+                        JobPost.minhash_signature != None))
+                signatures = dict(result.all())
+            for job_post_id, keywords in job_post_keywords.items():
+                self.add_job_post(
+                    job_post_id, 
+                    keywords, 
+                    degree_required[job_post_id], 
+                    signature=signatures.get(job_post_id),
+                    norm=norms[job_post_id],
+                    simhash=simhashes[job_post_id][0],
+                    company_name=simhashes[job_post_id][1],
+                    duplicate_of=simhashes[job_post_id][2])
+            self.loaded = True
+
+    # keywords is a {keyword id: weight} dict, a plain iterable gives every keyword a weight of 1
+    def add_job_post(
+            self, 
+            job_post_id: int, 
+            keywords, 
+            degree_required: DegreeRequired, 
+            signature: Union[bytes, None] = None,
+            norm: Union[float, None] = None,
+            simhash: Union[int, None] = None,
+            company_name: Union[str, None] = None,
+            duplicate_of: Union[int, None] = None):
+        # re-adding a job post replaces its previous keywords
+        self.remove_job_post(job_post_id)
+        if not isinstance(keywords, dict):
+            keywords = {keyword_id: 1.0 for keyword_id in keywords}
+        if not keyword_stopwords.ids.isdisjoint(keywords):
+            keywords = {
+                keyword_id: weight for keyword_id, weight in keywords.items() 
+                if keyword_id not in keyword_stopwords.ids}
+            # the stored norm still counts the stopwords
+            norm = None
+        if not keywords:
+            return
+        self.job_post_keywords[job_post_id] = keywords
+        self.job_post_degree_required[job_post_id] = degree_required
+        # norms are stored with the job post, only posts saved before they were are computed here
+        self.job_post_norms[job_post_id] = norm or keyword_norm(keywords, self.idf)
+        for keyword_id in keywords:
+            self.postings[keyword_id].add(job_post_id)
+        if self.lsh is not None:
+            # fall back to computing the signature for posts stored before MinHash was enabled
+            self.lsh.insert(
+                job_post_id, 
+                signature_from_bytes(signature) if signature else minhasher.signature(keywords))
+        if self.simhashes is not None and simhash is not None and company_name is not None:
+            self.simhashes.insert(job_post_id, simhash, company_name, duplicate_of)
+
+    def remove_job_post(self, job_post_id: int):
+        if self.lsh is not None:
+            self.lsh.remove(job_post_id)
+        if self.simhashes is not None:
+            self.simhashes.remove(job_post_id)
+        keywords = self.job_post_keywords.pop(job_post_id, None)
+        self.job_post_norms.pop(job_post_id, None)
+        self.job_post_degree_required.pop(job_post_id, None)
+        if keywords is None:
+            return
+        for keyword_id in keywords:
+            posting = self.postings.get(keyword_id)
+            if posting is None:
+                continue
+            posting.discard(job_post_id)
+            if not posting:
+                del self.postings[keyword_id]
+
+    def document_frequency(self, keyword_id: int) -> int:
+        posting = self.postings.get(keyword_id)
+        return len(posting) if posting else 0
+
+    def idf(self, keyword_id: int) -> float:
+        return inverse_document_frequency(self.document_frequency(keyword_id), len(self))
+
+    # the job post of the company a description with this fingerprint duplicates, if any
+    def find_duplicate(
+            self, 
+            simhash: Union[int, None], 
+            company_name: str, 
+            exclude: Union[int, None] = None) -> Union[int, None]:
+        if self.simhashes is None:
+            return None
+        return self.simhashes.find_duplicate(simhash, company_name, exclude=exclude)
+
+    # a duplicate is collapsed into the job post it duplicates while that one is indexed
+    def is_collapsed(self, job_post_id: int) -> bool:
+        if self.simhashes is None:
+            return False
+        duplicate_of = self.simhashes.duplicate_of.get(job_post_id)
+        return duplicate_of is not None and duplicate_of in self.job_post_keywords
+
+    def hand_over_duplicates(self, handovers: dict[int, int]):
+        if self.simhashes is None:
+            return
+        for previous_id, job_post_id in handovers.items():
+            self.simhashes.hand_over(previous_id, job_post_id)
+
+    def is_excluded(self, job_post_id: int, exclude_degree_required: Union[list[DegreeRequired], None]) -> bool:
+        if exclude_degree_required and self.job_post_degree_required[job_post_id] in exclude_degree_required:
+            return True
+        return self.is_collapsed(job_post_id)
+
+    # number of shared keywords for every job post sharing at least one keyword
+    def candidates(self, keywords, exclude_degree_required: Union[list[DegreeRequired], None] = None):
+        overlap = Counter()
+        for keyword_id in keywords:
+            posting = self.postings.get(keyword_id)
+            if posting and keyword_id not in keyword_stopwords.ids:
+                overlap.update(posting)
+        for job_post_id in list(overlap):
+            if self.is_excluded(job_post_id, exclude_degree_required):
+                del overlap[job_post_id]
+        return overlap
+
+    # approximate candidates from the LSH index, only used when MinHash is enabled
+    def approximate_candidates(self, signature, exclude_degree_required: Union[list[DegreeRequired], None] = None):
+        return {
+            job_post_id for job_post_id in self.lsh.query(signature) 
+            if not self.is_excluded(job_post_id, exclude_degree_required)}
+
+    def clear(self):
+        self.postings.clear()
+        self.job_post_keywords.clear()
+        self.job_post_norms.clear()
+        self.job_post_degree_required.clear()
+        if self.lsh is not None:
+            self.lsh.clear()
+        if self.simhashes is not None:
+            self.simhashes.clear()
+        self.loaded = False
+
+
+job_post_index = JobPostKeywordIndex()
+
+
+async def get_job_post_keyword_weights(session: AsyncSession, job_post_id: int) -> dict[int, float]:
+    result = await session.exec(
+        select(JobPostKeyword.keyword_id, JobPostKeyword.weight)
+        .where(JobPostKeyword.job_post_id == job_post_id))
+    return dict(result.all())
+
+
+# Keep the index in sync with a job post after it has been committed.
+# When the keywords are not passed they are read from the database.
+async def refresh_job_post_index(
+        session: AsyncSession,
+        job_post: JobPost,
+        keywords: Union[dict[int, float], None] = None):
+    # the full load will pick the job post up if the index hasn't been built yet
+    if not job_post_index.loaded:
+        return
+    if not is_recommendable(job_post):
+        job_post_index.remove_job_post(job_post.id)
+        return
+    if keywords is None:
+        keywords = await get_job_post_keyword_weights(session, job_post.id)
+    job_post_index.add_job_post(
+        job_post.id, 
+        keywords, 
+        job_post.degree_required, 
+        signature=job_post.minhash_signature,
+        norm=job_post.keyword_norm,
+        simhash=job_post.simhash,
+        company_name=job_post.company_name,
+        duplicate_of=job_post.duplicate_of)
+
+
+# The duplicates of job posts that stopped being recommendable would otherwise never be
+# recommended again (their stored recommendations were dropped when they were flagged):
+# the oldest recommendable duplicate of each job post stops being a duplicate and the
+# others are re-pointed to it. Returns {job post id: duplicate taking its place}, the
+# new job posts have to be rescored and, once committed, job_post_index.hand_over_duplicates
+# updates the index.
+async def hand_over_duplicates(session: AsyncSession, job_post_ids: list[int]) -> dict[int, int]:
+    if not job_post_ids:
+        return {}
+    result = await session.exec(
+        select(JobPost.duplicate_of, func.min(JobPost.id))
+        .where(
+            JobPost.duplicate_of.in_(job_post_ids),
+            JobPost.visibility == Visibility.PUBLIC,
+            JobPost.status == JobPostStatus.ONGOING)
+        .group_by(JobPost.duplicate_of))
+    handovers = dict(result.all())
+    for previous_id, job_post_id in handovers.items():
+        await session.exec(
+            update(JobPost)
+            .where(JobPost.duplicate_of == previous_id)
+            .values(duplicate_of=case((JobPost.id == job_post_id, None), else_=job_post_id))
+            .execution_options(synchronize_session="fetch"))
+    return handovers
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Iterable, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession as SQLModelAsyncSession
+from src.job_posts.models import Keyword
+from src.config import keyword_extraction_config
+
+
+# Interned keyword stems
+# Every stem gets an integer id in the keyword table, job post and student keywords
+# reference it and everything after extraction (indexes, scoring, MinHash) works with
+# the ids. Ids never change once assigned, so each process keeps the stem -> id
+# mapping it has seen in memory. The vocabulary of stems grows slowly (a few tens of
+# thousands), the mapping is not evicted.
+# New stems are inserted in their own short transaction (on the caller's engine) and
+# committed straight away: a cached id must exist even if the caller's transaction is
+# rolled back, and a stem row without any keywords referencing it is harmless.
+
+class KeywordVocabulary:
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, keyword_id: int, keyword: str):
+        self.ids[keyword] = keyword_id
+
+    async def load_ids(self, session: AsyncSession, keywords: list[str]):
+        result = await session.exec(select(Keyword.id, Keyword.keyword).where(Keyword.keyword.in_(keywords)))
+        for keyword_id, keyword in result.all():
+            self.add(keyword_id, keyword)
+
+    # stem -> id, stems that aren't in the table yet are added when create is set and
+    # left out otherwise
+    async def get_ids(self, session: AsyncSession, keywords: Iterable[str], create: bool = True) -> dict[str, int]:
+        keywords = set(keywords)
+        missing = [keyword for keyword in keywords if keyword not in self.ids]
+        if missing:
+            await self.load_ids(session, missing)
+            missing = [keyword for keyword in missing if keyword not in self.ids]
+        if missing and create:
+            async with SQLModelAsyncSession(session.bind) as vocabulary_session:
+                await vocabulary_session.exec(
+                    insert(Keyword)
+                    .values([{"keyword": keyword} for keyword in missing])
+                    .on_conflict_do_nothing(index_elements=[Keyword.keyword]))
+                await vocabulary_session.commit()
+                # stems inserted concurrently by another process are read back as well
+                await self.load_ids(vocabulary_session, missing)
+        return {keyword: self.ids[keyword] for keyword in keywords if keyword in self.ids}
+
+    def clear(self):
+        self.ids.clear()
+
+
+keyword_vocabulary = KeywordVocabulary()
+
+
+# Stopwords derived from the corpus
+# A stem is flagged as a stopword when it appears in too many of the recommendable job
+# posts (promote_stopwords in src/keyword_weights.py, run offline by the reindex and
+# import commands). The flag is sticky: the keywords of a stopword are deleted when it
+# is promoted and new ones are never stored, so its document frequency no longer says
+# how common it is.
+# Every process keeps the flagged stems and their ids, reloading them after
+# STOPWORD_REFRESH_SECONDS so that newly promoted stems stop being stored.
+
+class KeywordStopwords:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.ids: frozenset[int] = frozenset()
+        self.stems: frozenset[str] = frozenset()
+        self.loaded_at: Union[float, None] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def expired(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if not self.expired:
+            return
+        async with self._lock:
+            if not self.expired:
+                return
+            result = await session.exec(select(Keyword.id, Keyword.keyword).where(Keyword.is_stopword == True))
+            rows = result.all()
+            self.ids = frozenset(keyword_id for keyword_id, _ in rows)
+            self.stems = frozenset(keyword for _, keyword in rows)
+            self.loaded_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "stopwords": len(self.ids),
+            "refresh_seconds": self.refresh_seconds,
+            "seconds_since_load": time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+        }
+
+
+keyword_stopwords = KeywordStopwords(keyword_extraction_config.STOPWORD_REFRESH_SECONDS)
+
+
+# {stem: weight} dicts from the extractor -> {keyword id: weight} dicts, stopwords are
+# dropped and the stems of every dict are interned together
+async def intern_keyword_batch(session: AsyncSession, keyword_dicts: list[dict[str, float]]) -> list[dict[int, float]]:
+    await keyword_stopwords.ensure_loaded(session)
+    keyword_dicts = [
+        {keyword: weight for keyword, weight in keywords.items() if keyword not in keyword_stopwords.stems}
+        for keywords in keyword_dicts]
+    stems = {keyword for keywords in keyword_dicts for keyword in keywords}
+    ids = await keyword_vocabulary.get_ids(session, stems) if stems else {}
+    return [{ids[keyword]: weight for keyword, weight in keywords.items()} for keywords in keyword_dicts]
+
+async def intern_keywords(session: AsyncSession, keywords: dict[str, float]) -> dict[int, float]:
+    if not keywords:
+        return {}
+    return (await intern_keyword_batch(session, [keywords]))[0]
@@ -0,0 +1,113 @@
+import math
+from typing import Iterable, Callable
+from sqlalchemy import func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select, update, delete
+from src.job_posts.models import JobPost, JobPostKeyword, JobPostStatus, Visibility, Keyword, KeywordDocumentFrequency
+from src.students.models import StudentKeyword
+from src.config import keyword_extraction_config
+
+
+# TF-IDF keyword weighting
+# The term weight is the (normalised) TextRank score stored with each keyword and the
+# inverse document frequency comes from the number of recommendable job posts each
+# keyword appears in, so very common stems (e.g. "engin") count for less.
+# https://scikit-learn.org/stable/modules/feature_extraction.html#tfidf-term-weighting
+
+
+# smoothed idf, never zero so that keywords in every job post still count a little
+def inverse_document_frequency(document_frequency: int, document_count: int) -> float:
+    return math.log((1 + document_count) / (1 + document_frequency)) + 1
+
+
+def keyword_norm(keyword_weights: dict[int, float], idf: Callable[[int], float]) -> float:
+    return math.sqrt(sum((weight * idf(keyword_id)) ** 2 for keyword_id, weight in keyword_weights.items()))
+
+
+# Apply a change in a job post's contribution to the corpus document frequencies,
+# removed_keywords/added_keywords are the keyword ids that stopped/started being counted
+async def update_document_frequencies(
+        session: AsyncSession,
+        removed_keywords: Iterable[int],
+        added_keywords: Iterable[int]):
+    removed_keywords = set(removed_keywords)
+    added_keywords = set(added_keywords)
+    if added_keywords:
+        statement = insert(KeywordDocumentFrequency).values(
+            [{"keyword_id": keyword_id, "job_post_count": 1} for keyword_id in added_keywords])
+        statement = statement.on_conflict_do_update(
+            index_elements=[KeywordDocumentFrequency.keyword_id],
+            set_={"job_post_count": KeywordDocumentFrequency.job_post_count + 1})
+        await session.exec(statement)
+    if removed_keywords:
+        await session.exec(
+            update(KeywordDocumentFrequency)
+            .where(KeywordDocumentFrequency.keyword_id.in_(removed_keywords))
+            .values(job_post_count=KeywordDocumentFrequency.job_post_count - 1))
+
+
+# Flag the keywords in more than STOPWORD_MAX_DOCUMENT_FREQUENCY of the document_count
+# recommendable job posts as stopwords, see KeywordStopwords in src/keyword_vocabulary.py
+# Their keywords and document frequency rows are deleted, the common stems would
+# otherwise fill both keyword tables and the index's longest posting lists. Returns the
+# new {keyword id: stem} stopwords.
+# Deleting a stem's keywords changes the norm of every job post it was in, so this only
+# runs as part of rebuild_keyword_statistics (an offline command), which recomputes the
+# norms afterwards. Web processes pick the stopwords up when they reload.
+async def promote_stopwords(session: AsyncSession, document_count: int) -> dict[int, str]:
+    if document_count < keyword_extraction_config.STOPWORD_MIN_JOB_POSTS:
+        return {}
+    threshold = keyword_extraction_config.STOPWORD_MAX_DOCUMENT_FREQUENCY * document_count
+    common_keywords = select(KeywordDocumentFrequency.keyword_id).where(KeywordDocumentFrequency.job_post_count > threshold)
+    result = await session.exec(
+        update(Keyword)
+        .where(Keyword.is_stopword == False, Keyword.id.in_(common_keywords))
+        .values(is_stopword=True)
+        .returning(Keyword.id, Keyword.keyword))
+    stopwords = dict(result.all())
+    if stopwords:
+        for model in (JobPostKeyword, StudentKeyword, KeywordDocumentFrequency):
+            await session.exec(delete(model).where(model.keyword_id.in_(list(stopwords))))
+    return stopwords
+
+
+# Recompute the document frequencies and the stored norms of the recommendable job posts
+# from the keyword tables, after keywords were rewritten in bulk (src/reindex_keywords.py)
+# Stems over the stopword threshold are promoted before the norms are computed.
+# The idf in the norm query is inverse_document_frequency written in SQL. Returns the
+# number of recommendable job posts with keywords and the new stopwords.
+async def rebuild_keyword_statistics(session: AsyncSession):
+    recommendable = (JobPost.visibility == Visibility.PUBLIC, JobPost.status == JobPostStatus.ONGOING)
+    result = await session.exec(
+        select(func.count(func.distinct(JobPostKeyword.job_post_id)))
+        .join(JobPost)
+        .where(*recommendable))
+    document_count = result.one()
+
+    await session.exec(delete(KeywordDocumentFrequency))
+    await session.exec(
+        insert(KeywordDocumentFrequency).from_select(
+            ["keyword_id", "job_post_count"],
+            select(JobPostKeyword.keyword_id, func.count())
+            .join(JobPost)
+            .where(*recommendable)
+            .group_by(JobPostKeyword.keyword_id)))
+    stopwords = await promote_stopwords(session, document_count)
+
+    idf = func.ln(
+        literal(1 + document_count) / (1.0 + func.coalesce(KeywordDocumentFrequency.job_post_count, 0))) + 1
+    norms = (
+        select(
+            JobPostKeyword.job_post_id, 
+            func.sqrt(func.sum(func.power(JobPostKeyword.weight * idf, 2))).label("norm"))
+        .join(JobPost)
+        .outerjoin(KeywordDocumentFrequency, KeywordDocumentFrequency.keyword_id == JobPostKeyword.keyword_id)
+        .where(*recommendable)
+        .group_by(JobPostKeyword.job_post_id)
+        .subquery())
+    await session.exec(
+        update(JobPost)
+        .where(JobPost.id == norms.c.job_post_id)
+        .values(keyword_norm=norms.c.norm))
+    return document_count, stopwords
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from src.init_db import init_db
 from src.seed_db import seed_db
+from src.keyword_extraction import keyword_extractor, keyword_extraction_pool
 from src.auth.router import router as auth_router
 from src.skill_tags.router import router as skill_tags_router
 from src.job_profiles.router import router as job_profiles_router
@@ -25,7 +26,13 @@ from src.interactions.router import router as interactions_router
 async def lifespan(app: FastAPI):
     await init_db()
     await seed_db()
+    # the web process only extracts keywords itself when the pool is disabled
+    if keyword_extraction_pool.enabled:
+        await keyword_extraction_pool.start()
+    else:
+        keyword_extractor.warm_up()
     yield
+    keyword_extraction_pool.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
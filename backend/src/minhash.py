@@ -0,0 +1,128 @@
+import hashlib
+import struct
+from collections import defaultdict
+from typing import Iterable, Union
+import numpy as np
+from src.config import recommendation_config
+
+
+# MinHash signatures and an LSH banding index for approximate candidate generation
+# http://infolab.stanford.edu/~ullman/mmds/ch3.pdf (section 3.4)
+# The probability that two keyword sets with Jaccard similarity s share at least one
+# band is 1 - (1 - s^rows)^bands, so more bands gives better recall and more rows
+# gives fewer (but more similar) candidates.
+# The permutations are the universal hash family h(x) = ((a * x + b) mod p) mod 2^32
+# with p the Mersenne prime 2^61 - 1, x a 32-bit keyword hash and a, b < p. a * x can
+# need 93 bits, so a is split into its high 29 and low 32 bits: a_lo * x fits in 64
+# bits and a_hi * x * 2^32 is reduced with 2^61 = 1 (mod p) before anything is added,
+# which keeps every intermediate value below 2^64.
+# Changing the hash family changes every signature, the stored ones are recomputed by
+# python -m src.reindex_keywords.
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+LOW_29_BITS = np.uint64((1 << 29) - 1)
+
+
+# keyword ids are distinct integers already and are used as they are (they fit in 32
+# bits), strings are hashed with SHA-1 to stay stable across processes, unlike the
+# built-in hash()
+def hash_keyword(keyword: Union[int, str]) -> int:
+    if isinstance(keyword, (int, np.integer)):
+        return int(keyword) & int(MAX_HASH)
+    return struct.unpack('<I', hashlib.sha1(keyword.encode('utf-8')).digest()[:4])[0]
+
+
+class MinHasher:
+    def __init__(self, num_perm: int, seed: int = 1):
+        self.num_perm = num_perm
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.a_high = self.a >> np.uint64(32)
+        self.a_low = self.a & MAX_HASH
+
+    # (a * x + b) mod p for every keyword hash x (rows) and permutation (columns)
+    def permute(self, hashes: np.ndarray) -> np.ndarray:
+        x = hashes[:, None]
+        low = (self.a_low * x) % MERSENNE_PRIME
+        high = self.a_high * x
+        high = (high >> np.uint64(29)) + ((high & LOW_29_BITS) << np.uint64(32))
+        return (high + low + self.b) % MERSENNE_PRIME
+
+    def signature(self, keywords: Iterable[Union[int, str]]) -> np.ndarray:
+        hashes = np.array([hash_keyword(keyword) for keyword in set(keywords)], dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        return (self.permute(hashes) & MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+# fraction of equal minimums, an unbiased estimate of the Jaccard similarity
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    return float(np.mean(signature1 == signature2))
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype('<u4').tobytes()
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype='<u4').astype(np.uint32)
+
+
+class LSHIndex:
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: list[dict[bytes, set[int]]] = [defaultdict(set) for _ in range(bands)]
+        self.keys: dict[int, list[bytes]] = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def insert(self, item_id: int, signature: np.ndarray):
+        self.remove(item_id)
+        keys = self.band_keys(signature)
+        self.keys[item_id] = keys
+        for band, key in enumerate(keys):
+            self.buckets[band][key].add(item_id)
+
+    def remove(self, item_id: int):
+        keys = self.keys.pop(item_id, None)
+        if keys is None:
+            return
+        for band, key in enumerate(keys):
+            bucket = self.buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.discard(item_id)
+            if not bucket:
+                del self.buckets[band][key]
+
+    # ids sharing at least one band with the signature
+    def query(self, signature: np.ndarray) -> set[int]:
+        candidates = set()
+        for band, key in enumerate(self.band_keys(signature)):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+        return candidates
+
+    def clear(self):
+        for bucket in self.buckets:
+            bucket.clear()
+        self.keys.clear()
+
+
+minhasher = MinHasher(
+    num_perm=recommendation_config.MINHASH_BANDS * recommendation_config.MINHASH_ROWS,
+    seed=recommendation_config.MINHASH_SEED)
+
+
+# Signature stored on JobPost/Student rows, None when MinHash is disabled
+def compute_minhash_signature(keywords: Iterable[int]) -> Union[bytes, None]:
+    if not recommendation_config.MINHASH_ENABLED:
+        return None
+    return signature_to_bytes(minhasher.signature(keywords))
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+from src.config import recommendation_config
+
+
+# Bounded LRU/TTL cache of recommendation pages
+# Entries are keyed by the student id and a version stamp made of the student's version
+# and the job post catalogue version. The student's version advances when their keywords,
+# degrees or skill tags change and the catalogue version advances when a job post is
+# created or updated, so stale entries are never read again and age out of the LRU.
+# The cache is per process, the TTL bounds how stale another worker's entries can be.
+
+class RecommendationCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.student_versions: dict[Hashable, int] = {}
+        self.catalogue_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def version(self, student_id: Hashable):
+        return (self.student_versions.get(student_id, 0), self.catalogue_version)
+
+    def key(self, student_id: Hashable, *args: Hashable):
+        return (student_id, self.version(student_id), *args)
+
+    def get(self, key: Hashable):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_student(self, student_id: Hashable):
+        self.student_versions[student_id] = self.student_versions.get(student_id, 0) + 1
+
+    def invalidate_catalogue(self):
+        self.catalogue_version += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "catalogue_version": self.catalogue_version,
+        }
+
+
+recommendation_cache = RecommendationCache(
+    recommendation_config.RECOMMENDATION_CACHE_SIZE,
+    recommendation_config.RECOMMENDATION_CACHE_TTL)
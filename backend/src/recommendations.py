@@ -1,72 +1,661 @@
+import heapq
+from collections import defaultdict, Counter
+from datetime import datetime, timezone
+from typing import Union
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
-from src.job_posts.models import JobPostKeyword
-from src.students.models import StudentKeyword
+from sqlmodel import select, delete, update, or_
+from src.students.models import Student, StudentKeyword, StudentRecommendation, StudentSkillTag
+from src.auth.models import User
 from src.models import ConstrainedId
-from src.job_posts.models import JobPost, Visibility, DegreeRequired
-from src.students.service import get_student_by_id
+from src.job_posts.models import JobPost, JobPostRead, JobPostSkillTag, DegreeRequired, Visibility, JobPostStatus
+from src.events.models import Event, EventStatus
+from src.content.models import Content, ContentGroup
+from src.groups.models import GroupMember
 from src.students.exceptions import StudentNotFound
-from src.students.utils import get_highest_level_of_study 
+from src.students.utils import get_highest_levels_of_study
+from src.keyword_index import JobPostKeywordIndex, job_post_index, is_recommendable, get_job_post_keyword_weights
+from src.keyword_weights import keyword_norm, inverse_document_frequency
+from src.keyword_vocabulary import keyword_stopwords
+from src.minhash import minhasher, signature_from_bytes
+from src.config import recommendation_config
+from src.recommendation_cache import recommendation_cache
+from src.skill_index import SkillEntityIndex, event_skill_index, content_skill_index, entity_keyword_ids
+from src.similarity import (
+    build_vocabulary, 
+    encode_keyword_sets, 
+    keyword_id_width,
+    encode_keyword_ids, 
+    encode_weighted_keyword_ids, 
+    jaccard_matrix, 
+    cosine_matrix, 
+    top_k_per_row,
+    coverage_matrix,
+    row_sizes,
+    jaccard_ids
+)
 
 
 
 # Use keywords to recommend job posts to students and candidates to companies
 # https://www.learndatasci.com/glossary/jaccard-similarity/  
+# By default keywords are weighted by TF-IDF (TextRank weight * inverse document frequency
+# over the recommendable job posts) and ranked by cosine similarity, KEYWORD_SCORING=jaccard
+# switches back to plain Jaccard similarity. Both are computed with sparse matrices in
+# src/similarity.py
+# When a job post has skill tags, the share of them the student has is blended into the
+# score (SKILL_SCORE_WEIGHT), skill tags are compared as binary sparse matrices like keywords
 
-def jaccard_similarity(set1, set2):
-    intersection = set1.intersection(set2)
-    union = set1.union(set2)
-    return len(intersection) / len(union)
+POSTGRADUATE_LEVELS = ["PhD", "Postgraduate"]
+
+# number of recommendations stored per student in the student_recommendation table
+MAX_STORED_RECOMMENDATIONS = 200
 
 async def get_student_keywords(session: AsyncSession, student_id: ConstrainedId):
-    student = await get_student_by_id(student_id, session)
+    student = await session.get(Student, student_id)
     if student is None:
         raise StudentNotFound()
     result = await session.exec(
-        select(StudentKeyword.keyword)
+        select(StudentKeyword.keyword_id, StudentKeyword.weight)
         .where(StudentKeyword.student_id == student_id))
-    return set(result.all())
+    return dict(result.all())
+
+# Everything a student's recommendations need from the database in one statement:
+# the denormalised highest level of study, the skill tag ids (aggregated in a subquery)
+# and one row per keyword, the outer join keeps the student row when they have no keywords
+async def get_student_recommendation_profile(session: AsyncSession, student_id: ConstrainedId):
+    skill_ids = (
+        select(func.array_agg(StudentSkillTag.skill_id))
+        .where(StudentSkillTag.student_id == Student.id)
+        .correlate(Student)
+        .scalar_subquery())
+    result = await session.exec(
+        select(Student.highest_level_of_study, skill_ids, StudentKeyword.keyword_id, StudentKeyword.weight)
+        .outerjoin(StudentKeyword, StudentKeyword.student_id == Student.id)
+        .where(Student.id == student_id))
+    rows = result.all()
+    if not rows:
+        raise StudentNotFound()
+    highest_level_of_study, student_skills, _, _ = rows[0]
+    keywords = {keyword_id: weight for _, _, keyword_id, weight in rows if keyword_id is not None}
+    return keywords, highest_level_of_study, set(student_skills or [])
+
+# Score matrix of students (rows) against job posts (columns), keywords are {keyword id: weight} dicts
+# The job post norms are the ones stored with the job posts, the index must be loaded
+# as the document frequencies come from it
+def keyword_score_matrix(
+        student_keywords: list[dict[int, float]], 
+        job_post_keywords: list[dict[int, float]],
+        job_post_norms: list[float]) -> sparse.csr_matrix:
+    width = keyword_id_width(student_keywords, job_post_keywords)
+    if recommendation_config.KEYWORD_SCORING == "jaccard":
+        return jaccard_matrix(
+            encode_keyword_ids(student_keywords, width), 
+            encode_keyword_ids(job_post_keywords, width))
+    idf = job_post_index.idf
+    student_norms = [keyword_norm(keywords, idf) for keywords in student_keywords]
+    return cosine_matrix(
+        encode_weighted_keyword_ids(student_keywords, width, idf),
+        encode_weighted_keyword_ids(job_post_keywords, width, idf),
+        student_norms,
+        job_post_norms)
+
+# Skill tag ids, each loaded in a single query. Passing no ids loads every student/job post.
+async def get_student_skill_ids(session: AsyncSession, student_ids: Union[list[ConstrainedId], None] = None):
+    query = select(StudentSkillTag.student_id, StudentSkillTag.skill_id)
+    if student_ids is not None:
+        query = query.where(StudentSkillTag.student_id.in_(student_ids))
+    result = await session.exec(query)
+    skill_ids = defaultdict(set)
+    for student_id, skill_id in result.all():
+        skill_ids[student_id].add(skill_id)
+    return skill_ids
+
+async def get_job_post_skill_ids(session: AsyncSession, job_post_ids: Union[list[int], None] = None):
+    query = select(JobPostSkillTag.job_post_id, JobPostSkillTag.skill_id)
+    if job_post_ids is not None:
+        query = query.where(JobPostSkillTag.job_post_id.in_(job_post_ids))
+    result = await session.exec(query)
+    skill_ids = defaultdict(set)
+    for job_post_id, skill_id in result.all():
+        skill_ids[job_post_id].add(skill_id)
+    return skill_ids
+
+# Share of each job post's skill tags each student has, students (rows) x job posts (columns)
+def skill_score_matrix(student_skills: list[set[int]], job_post_skills: list[set[int]]):
+    vocabulary = build_vocabulary(job_post_skills)
+    job_post_matrix = encode_keyword_sets(job_post_skills, vocabulary)
+    return coverage_matrix(encode_keyword_sets(student_skills, vocabulary), job_post_matrix), job_post_matrix
+
+# Blend skill overlap into the non-zero keyword scores of a student x job post matrix,
+# job posts without skill tags keep their keyword score
+def blend_skill_scores(
+        scores: sparse.csr_matrix, 
+        student_skills: list[set[int]], 
+        job_post_skills: list[set[int]]) -> sparse.csr_matrix:
+    if not scores.nnz:
+        return scores
+    scores = scores.tocoo()
+    skill_scores, job_post_matrix = skill_score_matrix(student_skills, job_post_skills)
+    coverage = np.asarray(skill_scores[scores.row, scores.col]).ravel()
+    has_skills = row_sizes(job_post_matrix)[scores.col] > 0
+    weight = recommendation_config.SKILL_SCORE_WEIGHT
+    data = np.where(has_skills, (1 - weight) * scores.data + weight * coverage, scores.data)
+    return sparse.csr_matrix((data, (scores.row, scores.col)), shape=scores.shape)
+
+# Score a single student against the candidate job posts, returns (job_post_id, score) pairs
+def score_job_posts(
+        student_keywords: dict[int, float], 
+        job_post_keywords: dict[int, dict[int, float]],
+        student_skills: Union[set[int], None] = None,
+        job_post_skills: Union[dict[int, set[int]], None] = None):
+    if not job_post_keywords:
+        return []
+    job_post_ids = list(job_post_keywords.keys())
+    scores = keyword_score_matrix(
+        [student_keywords], 
+        list(job_post_keywords.values()), 
+        [job_post_index.job_post_norms[job_post_id] for job_post_id in job_post_ids])
+    if job_post_skills:
+        scores = blend_skill_scores(
+            scores, 
+            [student_skills or set()], 
+            [job_post_skills.get(job_post_id, set()) for job_post_id in job_post_ids])
+    row = scores.getrow(0)
+    return [(job_post_ids[column], float(score)) for column, score in zip(row.indices, row.data) if score > 0]
+
+# Job posts that share at least one keyword with the student, looked up through the
+# inverted keyword index rather than loading the keywords of every job post.
+# When MinHash is enabled the candidates come from the LSH index instead, only
+# those candidates are then scored exactly.
+async def get_job_post_keywords(
+        session: AsyncSession, 
+        student_id: ConstrainedId, 
+        student_keywords: dict[int, float],
+        highest_level_of_study: Union[str, None]):
+    exclude_degree_required = []
+    if highest_level_of_study not in POSTGRADUATE_LEVELS:
+        exclude_degree_required.append(DegreeRequired.MASTERS)
+
+    await job_post_index.ensure_loaded(session)
+    await keyword_stopwords.ensure_loaded(session)
+    if job_post_index.lsh is not None:
+        student = await session.get(Student, student_id)
+        if student.minhash_signature:
+            signature = signature_from_bytes(student.minhash_signature)
+        else:
+            signature = minhasher.signature(student_keywords)
+        candidates = job_post_index.approximate_candidates(signature, exclude_degree_required=exclude_degree_required)
+    else:
+        candidates = job_post_index.candidates(student_keywords, exclude_degree_required=exclude_degree_required)
+    return {job_post_id: job_post_index.job_post_keywords[job_post_id] for job_post_id in candidates}
+
+# Only the top offset + limit scores are kept (heap selection rather than a full sort),
+# ties are broken by job post id so that pages are stable between requests
+def top_k_scores(job_post_scores: list[tuple[int, float]], limit: int = 10, offset: int = 0):
+    top_scores = heapq.nlargest(offset + limit, job_post_scores, key=lambda x: (x[1], -x[0]))
+    return top_scores[offset:]
+
+# All non-zero scores for a student (up to MAX_STORED_RECOMMENDATIONS) in score order
+async def compute_recommendation_scores(session: AsyncSession, student_id: ConstrainedId):
+    student_keywords, highest_level_of_study, student_skills = await get_student_recommendation_profile(session, student_id)
+    if not student_keywords:
+        return []
+    job_post_keywords = await get_job_post_keywords(
+        session=session, 
+        student_id=student_id, 
+        student_keywords=student_keywords,
+        highest_level_of_study=highest_level_of_study)
+    job_post_skills = await get_job_post_skill_ids(session, list(job_post_keywords.keys())) if job_post_keywords else {}
+    job_post_scores = score_job_posts(
+        student_keywords, 
+        job_post_keywords, 
+        student_skills, 
+        job_post_skills)
+    return top_k_scores(job_post_scores, limit=MAX_STORED_RECOMMENDATIONS)
+
+async def get_stored_recommendations(
+        session: AsyncSession, 
+        student_id: ConstrainedId,
+        limit: int = 10,
+        offset: int = 0):
+    result = await session.exec(
+        select(JobPost)
+        .join(StudentRecommendation, StudentRecommendation.job_post_id == JobPost.id)
+        .where(
+            StudentRecommendation.student_id == student_id,
+            # job posts closed or made private since, e.g. by src/import_job_data.py,
+            # stay stored until the student is next recomputed
+            JobPost.visibility == Visibility.PUBLIC,
+            JobPost.status == JobPostStatus.ONGOING)
+        .order_by(StudentRecommendation.score.desc(), StudentRecommendation.job_post_id)
+        .offset(offset)
+        .limit(limit))
+    return result.all()
+
+async def get_recommendations_computed_at(session: AsyncSession, student_id: ConstrainedId):
+    result = await session.exec(
+        select(Student.recommendations_computed_at)
+        .where(Student.id == student_id))
+    rows = result.all()
+    if not rows:
+        raise StudentNotFound()
+    return rows[0]
+
+# Recommendations are read from the student_recommendation table, they are only
+# computed here when the student has never been computed. Students with nothing stored
+# after being computed get no recommendations until their keywords change or a new job
+# post matches them, both of which store their rows.
+async def load_recommended_jobs(
+        session: AsyncSession, 
+        student_id: ConstrainedId,
+        limit: int = 10,
+        offset: int = 0):
+    job_posts = await get_stored_recommendations(session, student_id, limit=limit, offset=offset)
+    if job_posts or offset > 0:
+        return job_posts
+    computed_at = await get_recommendations_computed_at(session, student_id)
+    if computed_at is not None:
+        return []
+    if not await refresh_student_recommendations(session, student_id):
+        return []
+    return await get_stored_recommendations(session, student_id, limit=limit, offset=offset)
+
+# Pages are cached as JobPostRead snapshots rather than ORM objects tied to the session
+async def get_recommended_jobs(
+        session: AsyncSession, 
+        student_id: ConstrainedId,
+        limit: int = 10,
+        offset: int = 0):
+    if not recommendation_cache.enabled:
+        return await load_recommended_jobs(session, student_id, limit=limit, offset=offset)
+    key = recommendation_cache.key(student_id, limit, offset)
+    job_posts = recommendation_cache.get(key)
+    if job_posts is None:
+        job_posts = await load_recommended_jobs(session, student_id, limit=limit, offset=offset)
+        job_posts = [JobPostRead.model_validate(job_post) for job_post in job_posts]
+        recommendation_cache.set(key, job_posts)
+    return job_posts
+
+
+# Incremental refresh of the student_recommendation table
+
+async def save_student_recommendations(session: AsyncSession, student_id: ConstrainedId, job_post_scores: list[tuple[int, float]]):
+    entries = [
+        StudentRecommendation(student_id=student_id, job_post_id=job_post_id, score=score) 
+        for job_post_id, score in job_post_scores]
+    session.add_all(entries)
+
+# Recompute a single student, e.g. after their keywords or degrees change
+async def refresh_student_recommendations(
+        session: AsyncSession, 
+        student_id: ConstrainedId,
+        commit: bool = True):
+    job_post_scores = await compute_recommendation_scores(session, student_id)
+    await session.exec(
+        delete(StudentRecommendation)
+        .where(StudentRecommendation.student_id == student_id))
+    await save_student_recommendations(session, student_id, job_post_scores)
+    await session.exec(
+        update(Student)
+        .where(Student.id == student_id)
+        .values(recommendations_computed_at=func.now()))
+    # callers not committing here invalidate the cache after their own commit
+    if commit:
+        await session.commit()
+        recommendation_cache.invalidate_student(student_id)
+    return job_post_scores
+
+# Students sharing at least one keyword with the job post, with all of their keywords
+async def get_overlapping_student_keywords(session: AsyncSession, keywords: set[int]):
+    overlapping_students = (
+        select(StudentKeyword.student_id)
+        .where(StudentKeyword.keyword_id.in_(keywords)))
+    result = await session.exec(
+        select(StudentKeyword.student_id, StudentKeyword.keyword_id, StudentKeyword.weight)
+        .join(Student, StudentKeyword.student_id == Student.id)
+        .join(User, Student.user_id == User.id)
+        .where(StudentKeyword.student_id.in_(overlapping_students), User.disabled == False))
+    student_keywords = defaultdict(dict)
+    for student_id, keyword_id, weight in result.all():
+        student_keywords[student_id][keyword_id] = weight
+    return student_keywords
+
+# Near-duplicates of a recommendable job post are left out of the recommendations
+async def is_collapsed_duplicate(session: AsyncSession, job_post: JobPost):
+    if job_post.duplicate_of is None:
+        return False
+    await job_post_index.ensure_loaded(session)
+    return job_post.duplicate_of in job_post_index.job_post_keywords
+
+# Rescore a job post against the students whose keywords overlap with it, after it has
+# been created, updated or closed (closed, private and duplicate posts are just removed)
+async def refresh_job_post_recommendations(
+        session: AsyncSession,
+        job_post: JobPost,
+        keywords: Union[dict[int, float], None] = None,
+        commit: bool = True):
+    await session.exec(
+        delete(StudentRecommendation)
+        .where(StudentRecommendation.job_post_id == job_post.id))
 
-async def get_job_post_keywords(session: AsyncSession, student_id: ConstrainedId):
-    highest_level_of_study = await get_highest_level_of_study(student_id=student_id, session=session)
+    if is_recommendable(job_post) and not await is_collapsed_duplicate(session, job_post):
+        if keywords is None:
+            keywords = await get_job_post_keyword_weights(session, job_post.id)
+        student_keywords = await get_overlapping_student_keywords(session, set(keywords)) if keywords else {}
+        if student_keywords:
+            await job_post_index.ensure_loaded(session)
+            student_ids = list(student_keywords.keys())
+            norm = job_post.keyword_norm or keyword_norm(keywords, job_post_index.idf)
+            scores = keyword_score_matrix(
+                [student_keywords[student_id] for student_id in student_ids],
+                [keywords],
+                [norm])
+            job_post_skills = await get_job_post_skill_ids(session, [job_post.id])
+            if job_post_skills:
+                student_skills = await get_student_skill_ids(session, student_ids)
+                scores = blend_skill_scores(
+                    scores,
+                    [student_skills.get(student_id, set()) for student_id in student_ids],
+                    [job_post_skills[job_post.id]])
+            scores = scores.tocoo()
+            student_levels = {}
+            if job_post.degree_required == DegreeRequired.MASTERS:
+                student_levels = await get_highest_levels_of_study(session, student_ids)
+            for row, score in zip(scores.row, scores.data):
+                student_id = student_ids[row]
+                if job_post.degree_required == DegreeRequired.MASTERS and student_levels.get(student_id) not in POSTGRADUATE_LEVELS:
+                    continue
+                session.add(StudentRecommendation(student_id=student_id, job_post_id=job_post.id, score=float(score)))
 
-    query = select(JobPostKeyword.job_post_id, JobPostKeyword.keyword).join(JobPost)
+    if commit:
+        await session.commit()
+        recommendation_cache.invalidate_catalogue()
 
+
+# Bulk scoring
+
+async def get_all_student_keywords(session: AsyncSession):
+    result = await session.exec(
+        select(StudentKeyword.student_id, StudentKeyword.keyword_id, StudentKeyword.weight)
+        .join(Student, StudentKeyword.student_id == Student.id)
+        .join(User, Student.user_id == User.id)
+        .where(User.disabled == False))
+    student_keywords = defaultdict(dict)
+    for student_id, keyword_id, weight in result.all():
+        student_keywords[student_id][keyword_id] = weight
+    return student_keywords
+
+# Zero the scores of job posts requiring a master's degree for students below postgraduate level
+def remove_ineligible_scores(
+        scores: sparse.csr_matrix, 
+        student_levels: list, 
+        job_post_degree_required: list[DegreeRequired]):
+    requires_masters = np.array([degree == DegreeRequired.MASTERS for degree in job_post_degree_required], dtype=bool)
+    below_postgraduate = np.array([level not in POSTGRADUATE_LEVELS for level in student_levels], dtype=bool)
+    if not requires_masters.any() or not below_postgraduate.any():
+        return scores
+    scores = scores.tocoo()
+    keep = ~(below_postgraduate[scores.row] & requires_masters[scores.col])
+    return sparse.csr_matrix(
+        (scores.data[keep], (scores.row[keep], scores.col[keep])), 
+        shape=scores.shape)
+
+# Snapshot of the recommendable job posts encoded once as a sparse matrix, so that
+# students can be scored against it in chunks (or in other processes, it pickles)
+# without encoding the catalogue again for every chunk
+# Collapsed duplicates are not part of the matrix, they still count towards the
+# document frequencies like in the index
+class JobPostMatrix:
+    def __init__(self, index: JobPostKeywordIndex, job_post_skills: dict[int, set[int]]):
+        self.job_post_ids = sorted(job_post_id for job_post_id in index.job_post_keywords if not index.is_collapsed(job_post_id))
+        job_post_keywords = [index.job_post_keywords[job_post_id] for job_post_id in self.job_post_ids]
+        self.keyword_scoring = recommendation_config.KEYWORD_SCORING
+        self.document_count = len(index)
+        # the keyword ids of the catalogue are the columns, the document frequencies are
+        # an array indexed by keyword id
+        self.width = keyword_id_width(index.job_post_keywords.values())
+        self.document_frequency = np.zeros(self.width, dtype=np.int32)
+        for keyword_id, posting in index.postings.items():
+            self.document_frequency[keyword_id] = len(posting)
+        if self.keyword_scoring == "jaccard":
+            self.keyword_matrix = encode_keyword_ids(job_post_keywords, self.width)
+        else:
+            self.keyword_matrix = encode_weighted_keyword_ids(job_post_keywords, self.width, self.idf)
+        self.keyword_sizes = row_sizes(self.keyword_matrix)
+        self.norms = np.array([index.job_post_norms[job_post_id] for job_post_id in self.job_post_ids])
+        self.degree_required = [index.job_post_degree_required[job_post_id] for job_post_id in self.job_post_ids]
+        self.skills = [job_post_skills.get(job_post_id, set()) for job_post_id in self.job_post_ids]
+        self.has_skills = any(self.skills)
+
+    def __len__(self):
+        return len(self.job_post_ids)
+
+    def idf(self, keyword_id: int) -> float:
+        document_frequency = self.document_frequency[keyword_id] if keyword_id < self.width else 0
+        return inverse_document_frequency(document_frequency, self.document_count)
+
+    # students (rows) x job posts (columns), same scores as keyword_score_matrix and blend_skill_scores
+    def score(
+            self, 
+            student_keywords: list[dict[int, float]], 
+            student_skills: list[set[int]], 
+            student_levels: list) -> sparse.csr_matrix:
+        if self.keyword_scoring == "jaccard":
+            scores = jaccard_matrix(
+                encode_keyword_ids(student_keywords, self.width), 
+                self.keyword_matrix,
+                np.array([len(keywords) for keywords in student_keywords]),
+                self.keyword_sizes)
+        else:
+            scores = cosine_matrix(
+                encode_weighted_keyword_ids(student_keywords, self.width, self.idf),
+                self.keyword_matrix,
+                [keyword_norm(keywords, self.idf) for keywords in student_keywords],
+                self.norms)
+        if self.has_skills:
+            scores = blend_skill_scores(scores, student_skills, self.skills)
+        return remove_ineligible_scores(scores, student_levels, self.degree_required)
+
+    # top k (job_post_id, score) pairs for each student
+    def top_k(
+            self, 
+            student_keywords: list[dict[int, float]], 
+            student_skills: list[set[int]], 
+            student_levels: list,
+            k: int) -> list[list[tuple[int, float]]]:
+        scores = self.score(student_keywords, student_skills, student_levels)
+        return [
+            [(self.job_post_ids[column], score) for column, score in student_top_k]
+            for student_top_k in top_k_per_row(scores, k)]
+
+async def get_job_post_matrix(session: AsyncSession):
+    await job_post_index.ensure_loaded(session)
+    job_post_skills = await get_job_post_skill_ids(session)
+    return JobPostMatrix(job_post_index, job_post_skills)
+
+# Score every active student against every recommendable job post in one sparse
+# matrix product, returns the top k (job_post_id, score) pairs for each student
+async def score_all_students(session: AsyncSession, top_k: int = 10):
+    student_keywords = await get_all_student_keywords(session)
+    job_post_matrix = await get_job_post_matrix(session)
+    if not student_keywords or not len(job_post_matrix):
+        return {}
+
+    student_ids = list(student_keywords.keys())
+    student_skills = await get_student_skill_ids(session)
+    highest_levels_of_study = await get_highest_levels_of_study(session, student_ids)
+    student_top_k = job_post_matrix.top_k(
+        [student_keywords[student_id] for student_id in student_ids],
+        [student_skills.get(student_id, set()) for student_id in student_ids],
+        [highest_levels_of_study.get(student_id) for student_id in student_ids],
+        top_k)
+    return dict(zip(student_ids, student_top_k))
+
+
+# Candidate students for a job post (reverse recommendations)
+# Candidates are the active students sharing at least one keyword or skill tag with the
+# job post, found through the keyword and skill indexes on student_keyword and
+# student_skill_tags. They are scored on keyword similarity and on the share of the
+# job post's skill tags they have.
+
+async def get_candidate_student_ids(session: AsyncSession, keywords: set[int], skill_ids: set[int]):
     conditions = []
+    if keywords:
+        conditions.append(Student.id.in_(
+            select(StudentKeyword.student_id).where(StudentKeyword.keyword_id.in_(keywords))))
+    if skill_ids:
+        conditions.append(Student.id.in_(
+            select(StudentSkillTag.student_id).where(StudentSkillTag.skill_id.in_(skill_ids))))
+    if not conditions:
+        return []
+    result = await session.exec(
+        select(Student.id)
+        .join(User, Student.user_id == User.id)
+        .where(or_(*conditions), User.disabled == False))
+    return result.all()
 
-    if highest_level_of_study not in ["PhD", "Postgraduate"]:
-        conditions.append(JobPost.degree_required != DegreeRequired.MASTERS)
-    
-    conditions.append(JobPost.visibility == Visibility.PUBLIC)
+async def get_student_keyword_weights(session: AsyncSession, student_ids: list[ConstrainedId]):
+    result = await session.exec(
+        select(StudentKeyword.student_id, StudentKeyword.keyword_id, StudentKeyword.weight)
+        .where(StudentKeyword.student_id.in_(student_ids)))
+    student_keywords = defaultdict(dict)
+    for student_id, keyword_id, weight in result.all():
+        student_keywords[student_id][keyword_id] = weight
+    return student_keywords
 
-    conditions.append(JobPost.status == "ongoing")
+# (student_id, score) pairs for every eligible candidate with a non-zero score
+async def compute_candidate_scores(session: AsyncSession, job_post: JobPost):
+    keywords = await get_job_post_keyword_weights(session, job_post.id)
+    result = await session.exec(
+        select(JobPostSkillTag.skill_id).where(JobPostSkillTag.job_post_id == job_post.id))
+    skill_ids = set(result.all())
 
-    query = query.where(*conditions)
+    student_ids = await get_candidate_student_ids(session, set(keywords), skill_ids)
+    if job_post.degree_required == DegreeRequired.MASTERS and student_ids:
+        student_levels = await get_highest_levels_of_study(session, student_ids)
+        student_ids = [
+            student_id for student_id in student_ids 
+            if student_levels.get(student_id) in POSTGRADUATE_LEVELS]
+    if not student_ids:
+        return []
 
-    result = await session.exec(query)
+    keyword_scores = np.zeros(len(student_ids))
+    if keywords:
+        await job_post_index.ensure_loaded(session)
+        student_keywords = await get_student_keyword_weights(session, student_ids)
+        norm = job_post.keyword_norm or keyword_norm(keywords, job_post_index.idf)
+        keyword_scores = keyword_score_matrix(
+            [student_keywords.get(student_id, {}) for student_id in student_ids],
+            [keywords],
+            [norm]).toarray()[:, 0]
+
+    # unlike blend_skill_scores students matching on skill tags alone are scored too
+    scores = keyword_scores
+    if skill_ids:
+        student_skills = await get_student_skill_ids(session, student_ids)
+        skill_scores, _ = skill_score_matrix(
+            [student_skills.get(student_id, set()) for student_id in student_ids],
+            [skill_ids])
+        skill_scores = skill_scores.toarray()[:, 0]
+        weight = recommendation_config.SKILL_SCORE_WEIGHT
+        scores = (1 - weight) * keyword_scores + weight * skill_scores
+
+    return [(student_id, float(score)) for student_id, score in zip(student_ids, scores) if score > 0]
+
+# Ranked candidates for a job post, ties are broken by student id so that pages are stable
+async def get_candidate_students(
+        session: AsyncSession, 
+        job_post: JobPost,
+        limit: int = 10,
+        offset: int = 0):
+    student_scores = await compute_candidate_scores(session, job_post)
+    top_scores = heapq.nsmallest(offset + limit, student_scores, key=lambda x: (-x[1], x[0]))[offset:]
+    if not top_scores:
+        return []
+    result = await session.exec(
+        select(Student).where(Student.id.in_([student_id for student_id, _ in top_scores])))
+    students = {student.id: student for student in result.all()}
+    return [
+        {"student": students[student_id], "score": score} 
+        for student_id, score in top_scores if student_id in students]
 
-    job_post_keywords = {}
-    for job_post_id, keyword in result.all():
-        if job_post_id not in job_post_keywords:
-            job_post_keywords[job_post_id] = set()
-        job_post_keywords[job_post_id].add(keyword)
-    return job_post_keywords
 
-async def get_recommended_jobs(session: AsyncSession, student_id: ConstrainedId):
+# Event and content recommendations
+# Candidates are the events and content sharing at least one skill tag with the student,
+# found through the skill indexes in src/skill_index.py. They are scored on the share of
+# their skill tags the student has, blended with the Jaccard similarity of the student's
+# keywords and the keywords of their text (ACTIVITY_SKILL_SCORE_WEIGHT).
+
+def score_activities(
+        entities: list, 
+        index: SkillEntityIndex, 
+        skill_overlap: Counter, 
+        student_keywords: dict[int, float]):
+    keyword_scores = {}
+    if student_keywords and entities:
+        student_keyword_ids = np.array(sorted(student_keywords), dtype=np.int32)
+        keyword_scores = {
+            entity.id: jaccard_ids(student_keyword_ids, entity_keyword_ids(entity)) 
+            for entity in entities}
+    weight = recommendation_config.ACTIVITY_SKILL_SCORE_WEIGHT
+    scores = []
+    for entity in entities:
+        skills = index.entity_skills.get(entity.id)
+        # the entity's skill tags may have been removed since the candidates were found
+        if not skills:
+            continue
+        skill_score = min(skill_overlap[entity.id] / len(skills), 1.0)
+        scores.append((entity, weight * skill_score + (1 - weight) * keyword_scores.get(entity.id, 0.0)))
+    return scores
+
+# entities ranked by score, ties are broken by id so that pages are stable
+def top_k_activities(scores: list[tuple], limit: int = 10, offset: int = 0):
+    top_scores = heapq.nsmallest(offset + limit, scores, key=lambda x: (-x[1], x[0].id))[offset:]
+    return [entity for entity, _ in top_scores]
+
+async def get_activity_candidates(session: AsyncSession, student_id: ConstrainedId, index: SkillEntityIndex):
     student_keywords = await get_student_keywords(session, student_id)
-    job_post_keywords = await get_job_post_keywords(session=session, student_id=student_id)
-    job_post_scores = []
-    for job_post_id, keywords in job_post_keywords.items():
-        score = jaccard_similarity(student_keywords, keywords)
-        if score > 0:
-            job_post_scores.append({"job_post_id": job_post_id, "score": score})
-    
-    
-    job_post_scores_sorted = sorted(job_post_scores, key=lambda x: x['score'], reverse=True)
-    
-    
-    top_job_posts = []
-    for job_post_score in job_post_scores_sorted[:10]:
-        job_post = await session.get(JobPost, job_post_score['job_post_id'])
-        top_job_posts.append(job_post)
-    return top_job_posts
+    student_skills = await get_student_skill_ids(session, [student_id])
+    await index.ensure_loaded(session)
+    return index.candidates(student_skills.get(student_id, set())), student_keywords
+
+# Upcoming events sharing skill tags with the student
+async def get_recommended_events(
+        session: AsyncSession, 
+        student_id: ConstrainedId, 
+        limit: int = 10, 
+        offset: int = 0):
+    skill_overlap, student_keywords = await get_activity_candidates(session, student_id, event_skill_index)
+    if not skill_overlap:
+        return []
+    result = await session.exec(
+        select(Event)
+        .where(
+            Event.id.in_(list(skill_overlap)),
+            Event.status == EventStatus.UPCOMING,
+            Event.event_start_time > datetime.now(timezone.utc)))
+    scores = score_activities(result.all(), event_skill_index, skill_overlap, student_keywords)
+    return top_k_activities(scores, limit, offset)
+
+# Content shared with the student's groups that shares skill tags with the student
+async def get_recommended_content(
+        session: AsyncSession, 
+        student_id: ConstrainedId, 
+        limit: int = 10, 
+        offset: int = 0):
+    skill_overlap, student_keywords = await get_activity_candidates(session, student_id, content_skill_index)
+    if not skill_overlap:
+        return []
+    result = await session.exec(
+        select(Content)
+        .where(
+            Content.id.in_(list(skill_overlap)),
+            Content.id.in_(
+                select(ContentGroup.content_id)
+                .join(GroupMember, GroupMember.group_id == ContentGroup.group_id)
+                .where(GroupMember.student_id == student_id))))
+    scores = score_activities(result.all(), content_skill_index, skill_overlap, student_keywords)
+    return top_k_activities(scores, limit, offset)
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sqlmodel import select, update, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.database import async_engine
+# imports every model so that the relationships can be resolved
+import src.init_db
+from src.job_posts.models import JobPost
+from src.students.models import Student
+from src.config import recommendation_config
+from src.keyword_extraction import extract_keyword_weights_batch, warm_up_worker, replace_keywords
+from src.keyword_vocabulary import intern_keyword_batch
+from src.keyword_weights import rebuild_keyword_statistics
+from src.minhash import compute_minhash_signature
+
+
+# Re-extract and rewrite the keywords of every job post and student
+#
+#   python -m src.reindex_keywords --workers 4
+#   python -m src.reindex_keywords --workers 4 --resume
+#
+# Run it after changing the stopwords or the extractor (bump KEYWORD_EXTRACTOR_VERSION
+# too so the keyword cache is not used), existing keywords are not updated otherwise.
+# Job post descriptions and student about texts are read in id order through a
+# server-side cursor, batch_size rows at a time. Each batch is extracted in the worker
+# processes while the previous one is written, and written in its own transaction with
+# replace_keywords (one statement per batch). The last id written is saved to the
+# state file after every batch, --resume carries on from there after an interruption.
+# Once every entity has been reindexed the keyword document frequencies and the job
+# post norms are rebuilt and stems over the stopword threshold are promoted (this is
+# the only place stopwords are promoted, along with src/import_job_data.py). The web
+# processes load their keyword indexes on startup, so restart them and then recompute
+# the stored recommendations:
+#   python -m src.batch_recommendations
+
+ENTITIES = {
+    "job_post": (JobPost, JobPost.description),
+    "student": (Student, Student.about),
+}
+
+
+def load_state(path: str, resume: bool):
+    if resume and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_state(path: str, state: dict):
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+async def write_batch(session: AsyncSession, entity_type: str, entity_ids: list, extraction: asyncio.Future):
+    extracted = await intern_keyword_batch(session, await extraction)
+    entity_keywords = dict(zip(entity_ids, extracted))
+    deleted, upserted = await replace_keywords(session, entity_type, entity_keywords)
+    if recommendation_config.MINHASH_ENABLED:
+        model, _ = ENTITIES[entity_type]
+        await session.exec(update(model), params=[
+            {"id": entity_id, "minhash_signature": compute_minhash_signature(keywords)}
+            for entity_id, keywords in entity_keywords.items()])
+    await session.commit()
+    return deleted, upserted
+
+class ReindexProgress:
+    def __init__(self, entity_type: str, total: int, state: dict, state_path: str):
+        self.entity_type = entity_type
+        self.total = total
+        self.state = state
+        self.state_path = state_path
+        self.processed = 0
+        self.deleted = 0
+        self.upserted = 0
+        self.start = time.perf_counter()
+
+    def record(self, entity_ids: list, deleted: int, upserted: int):
+        self.processed += len(entity_ids)
+        self.deleted += deleted
+        self.upserted += upserted
+        self.state[self.entity_type] = entity_ids[-1]
+        save_state(self.state_path, self.state)
+        print(
+            f"{self.entity_type}: {self.processed}/{self.total} "
+            f"({self.processed / (time.perf_counter() - self.start):.0f}/s), "
+            f"{self.deleted} keywords deleted, {self.upserted} inserted or reweighted")
+
+async def reindex_entities(entity_type: str, executor: ProcessPoolExecutor, state: dict, args):
+    model, text_column = ENTITIES[entity_type]
+    query = select(model.id, text_column)
+    if entity_type in state:
+        query = query.where(model.id > state[entity_type])
+
+    async with AsyncSession(async_engine) as read_session, AsyncSession(async_engine) as write_session:
+        total = (await read_session.exec(select(func.count()).select_from(query.subquery()))).one()
+        progress = ReindexProgress(entity_type, total, state, args.state)
+        result = await read_session.stream(query.order_by(model.id).execution_options(yield_per=args.batch_size))
+        # the next batch is extracted while the previous one is written
+        previous = None
+        async for rows in result.partitions():
+            extraction = asyncio.ensure_future(
+                extract_keyword_weights_batch(executor, [text or "" for _, text in rows], args.chunk_size))
+            if previous is not None:
+                progress.record(previous[0], *await write_batch(write_session, entity_type, *previous))
+            previous = ([entity_id for entity_id, _ in rows], extraction)
+        if previous is not None:
+            progress.record(previous[0], *await write_batch(write_session, entity_type, *previous))
+    print(f"Reindexed {progress.processed} {entity_type} rows in {time.perf_counter() - progress.start:.1f}s")
+
+async def reindex(args):
+    state = load_state(args.state, args.resume)
+    if state:
+        print(f"Resuming after {state}")
+    with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context("spawn"),
+            initializer=warm_up_worker) as executor:
+        for entity_type in args.entities:
+            await reindex_entities(entity_type, executor, state, args)
+
+    async with AsyncSession(async_engine) as session:
+        document_count, stopwords = await rebuild_keyword_statistics(session)
+        await session.commit()
+    print(f"Rebuilt the document frequencies and norms of {document_count} recommendable job posts")
+    if stopwords:
+        print(f"New stopwords: {', '.join(sorted(stopwords.values()))}")
+    await async_engine.dispose()
+    if os.path.exists(args.state):
+        os.remove(args.state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract the keywords of every job post and student")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=500, help="rows read, extracted and written together")
+    parser.add_argument("--chunk-size", type=int, default=64, help="texts sent to a worker at once")
+    parser.add_argument("--entities", nargs="+", choices=list(ENTITIES), default=list(ENTITIES))
+    parser.add_argument("--state", default="reindex_keywords_state.json")
+    parser.add_argument("--resume", action="store_true", help="skip the rows written by the last (interrupted) run")
+    parser.add_argument("--echo", action="store_true", help="log the SQL statements")
+    args = parser.parse_args()
+
+    async_engine.sync_engine.echo = args.echo
+    asyncio.run(reindex(args))
+
+
+if __name__ == "__main__":
+    main()
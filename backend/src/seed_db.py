@@ -665,6 +665,8 @@ def insert_dummy_data(conn):
             grade_awarded=None
         )
         session.add(student_degree)
+        student.highest_level_of_study = degree_computing.degree_level
+        session.add(student)
         session.commit()
         session.refresh(student_degree)
 
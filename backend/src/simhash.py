@@ -0,0 +1,155 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Union
+import numpy as np
+from src.config import recommendation_config
+
+
+# SimHash fingerprints of job post descriptions for near-duplicate detection
+# https://www.cs.princeton.edu/courses/archive/spring04/cos598B/bib/CharikarEstim.pdf
+# https://research.google/pubs/detecting-near-duplicates-for-web-crawling/
+# Every shingle of SHINGLE_SIZE consecutive words is hashed to 64 bits, bit i of the
+# fingerprint is set when most shingle hashes have it set. Texts sharing most of their
+# shingles get fingerprints differing in only a few bits, so near-duplicates are the
+# fingerprints within a small Hamming distance k of each other.
+# Fingerprints are stored as signed 64-bit integers (Postgres bigint), the bit
+# operations below mask them back to 64 bits.
+
+SHINGLE_SIZE = 3
+BITS = 64
+MASK = (1 << BITS) - 1
+
+
+def shingles(text: str) -> list[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+# blake2b rather than the built-in hash() so that fingerprints are stable across processes
+def hash_shingle(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+def compute_simhash(text: Union[str, None]) -> Union[int, None]:
+    features = shingles(text or "")
+    if not features:
+        return None
+    hashes = np.array([hash_shingle(shingle) for shingle in features], dtype=np.uint64)
+    bit_counts = ((hashes[:, None] >> np.arange(BITS, dtype=np.uint64)) & np.uint64(1)).sum(axis=0)
+    fingerprint = sum(1 << bit for bit in np.flatnonzero(2 * bit_counts > len(hashes)).tolist())
+    # two's complement, to fit a signed bigint
+    return fingerprint - (1 << BITS) if fingerprint >> (BITS - 1) else fingerprint
+
+def hamming_distance(simhash1: int, simhash2: int) -> int:
+    return ((simhash1 ^ simhash2) & MASK).bit_count()
+
+def company_key(company_name: str) -> str:
+    return " ".join(company_name.casefold().split())
+
+
+# Banded index of fingerprints for sub-linear lookups of the ones within max_distance
+# bits: the 64 bits are split into max_distance + 1 bands, two fingerprints differing in
+# at most max_distance bits agree on at least one whole band (pigeonhole principle), so
+# only the fingerprints sharing a band with the query are compared.
+# Fingerprints are only compared within a company: different employers often share
+# boilerplate descriptions, and collapsing their posts would hide one of the employers.
+# The buckets are keyed by the normalised company name along with the band.
+# Each fingerprint can be recorded as a duplicate of another job post, the job post a
+# near-duplicate is attached to is the one its closest match duplicates (or the match
+# itself), so chains of duplicates all point to the same job post.
+
+class SimHashIndex:
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self.band_widths = [BITS // bands + (band < BITS % bands) for band in range(bands)]
+        self.band_shifts = [sum(self.band_widths[:band]) for band in range(bands)]
+        self.buckets: list[dict[tuple[str, int], set[int]]] = [defaultdict(set) for _ in range(bands)]
+        self.simhashes: dict[int, int] = {}
+        self.companies: dict[int, str] = {}
+        self.duplicate_of: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.simhashes)
+
+    def band_keys(self, simhash: int, company: str) -> list[tuple[str, int]]:
+        return [
+            (company, (simhash >> shift) & ((1 << width) - 1))
+            for shift, width in zip(self.band_shifts, self.band_widths)]
+
+    def insert(self, item_id: int, simhash: int, company_name: str, duplicate_of: Union[int, None] = None):
+        self.remove(item_id)
+        self.simhashes[item_id] = simhash
+        self.companies[item_id] = company_key(company_name)
+        if duplicate_of is not None:
+            self.duplicate_of[item_id] = duplicate_of
+        for band, key in enumerate(self.band_keys(simhash, self.companies[item_id])):
+            self.buckets[band][key].add(item_id)
+
+    def remove(self, item_id: int):
+        simhash = self.simhashes.pop(item_id, None)
+        company = self.companies.pop(item_id, None)
+        self.duplicate_of.pop(item_id, None)
+        if simhash is None:
+            return
+        for band, key in enumerate(self.band_keys(simhash, company)):
+            bucket = self.buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.discard(item_id)
+            if not bucket:
+                del self.buckets[band][key]
+
+    # (distance, id) of the company's fingerprints within max_distance bits, closest first
+    def query(self, simhash: int, company_name: str) -> list[tuple[int, int]]:
+        candidates = set()
+        for band, key in enumerate(self.band_keys(simhash, company_key(company_name))):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+        matches = []
+        for item_id in candidates:
+            distance = hamming_distance(simhash, self.simhashes[item_id])
+            if distance <= self.max_distance:
+                matches.append((distance, item_id))
+        return sorted(matches)
+
+    # the job post of the same company a fingerprint duplicates, if any. exclude is the
+    # job post being fingerprinted, it can't duplicate itself or its own duplicates
+    def find_duplicate(
+            self, 
+            simhash: Union[int, None], 
+            company_name: str, 
+            exclude: Union[int, None] = None) -> Union[int, None]:
+        if simhash is None:
+            return None
+        for _, item_id in self.query(simhash, company_name):
+            duplicate_of = self.duplicate_of.get(item_id, item_id)
+            if item_id != exclude and duplicate_of != exclude:
+                return duplicate_of
+        return None
+
+    # the duplicates of a job post that left the index are attached to new_duplicate_of
+    # instead, which is no longer a duplicate itself
+    def hand_over(self, duplicate_of: int, new_duplicate_of: int):
+        for item_id, current in list(self.duplicate_of.items()):
+            if current != duplicate_of:
+                continue
+            if item_id == new_duplicate_of:
+                del self.duplicate_of[item_id]
+            else:
+                self.duplicate_of[item_id] = new_duplicate_of
+
+    def clear(self):
+        for bucket in self.buckets:
+            bucket.clear()
+        self.simhashes.clear()
+        self.companies.clear()
+        self.duplicate_of.clear()
+
+
+def create_simhash_index() -> Union[SimHashIndex, None]:
+    if not recommendation_config.DUPLICATE_DETECTION_ENABLED:
+        return None
+    return SimHashIndex(recommendation_config.DUPLICATE_MAX_DISTANCE)
@@ -0,0 +1,171 @@
+from typing import Iterable, Hashable, Callable, Union
+import numpy as np
+from scipy import sparse
+
+
+# Vectorised set similarity using sparse matrices
+# Each keyword set is encoded as a binary row of a CSR matrix over a shared vocabulary,
+# the intersection sizes for every pair of rows are then a single sparse matrix product
+# and the union sizes come from the row sums: |A ∪ B| = |A| + |B| - |A ∩ B|
+# Skill tag ids are encoded the same way, the overlap of skill sets is the same product
+# Weighted keywords are encoded the same way with TF-IDF values, the dot products then
+# give the numerator of the cosine similarity
+
+
+def build_vocabulary(*keyword_set_groups: Iterable[Iterable[Hashable]]) -> dict:
+    vocabulary = {}
+    for keyword_sets in keyword_set_groups:
+        for keywords in keyword_sets:
+            for keyword in keywords:
+                if keyword not in vocabulary:
+                    vocabulary[keyword] = len(vocabulary)
+    return vocabulary
+
+
+# keywords missing from the vocabulary are ignored
+def encode_keyword_sets(keyword_sets: list[Iterable[Hashable]], vocabulary: dict) -> sparse.csr_matrix:
+    indptr = [0]
+    indices = []
+    for keywords in keyword_sets:
+        columns = {vocabulary[keyword] for keyword in keywords if keyword in vocabulary}
+        indices.extend(sorted(columns))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    return sparse.csr_matrix(
+        (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(keyword_sets), len(vocabulary)))
+
+
+def row_sizes(matrix: sparse.csr_matrix) -> np.ndarray:
+    return np.diff(matrix.indptr)
+
+
+# Jaccard similarity of every row in a against every row in b
+# Only pairs sharing at least one keyword are stored, every other pair has a score of 0
+# The set sizes can be passed in when the vocabulary doesn't cover every keyword
+def jaccard_matrix(
+        a: sparse.csr_matrix, 
+        b: sparse.csr_matrix, 
+        a_sizes: Union[np.ndarray, None] = None, 
+        b_sizes: Union[np.ndarray, None] = None) -> sparse.csr_matrix:
+    a_sizes = row_sizes(a) if a_sizes is None else np.asarray(a_sizes)
+    b_sizes = row_sizes(b) if b_sizes is None else np.asarray(b_sizes)
+    intersection = (a @ b.T).tocoo()
+    union = a_sizes[intersection.row] + b_sizes[intersection.col] - intersection.data
+    scores = intersection.data / union
+    return sparse.csr_matrix((scores, (intersection.row, intersection.col)), shape=intersection.shape)
+
+
+# Weighted variant for TF-IDF scoring: the row values are weight * idf(keyword) instead of 1
+def encode_weighted_keywords(
+        keyword_weights: list[dict[Hashable, float]], 
+        vocabulary: dict, 
+        idf: Callable[[Hashable], float]) -> sparse.csr_matrix:
+    indptr = [0]
+    indices = []
+    data = []
+    for weights in keyword_weights:
+        row = sorted(
+            (vocabulary[keyword], weight * idf(keyword)) 
+            for keyword, weight in weights.items() if keyword in vocabulary)
+        indices.extend(column for column, _ in row)
+        data.extend(value for _, value in row)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(keyword_weights), len(vocabulary)))
+
+
+# Cosine similarity of every row in a against every row in b given the row norms
+# The norms are passed in rather than taken from the rows so that precomputed norms
+# over the full keyword lists can be used with a vocabulary restricted to the candidates
+def cosine_matrix(
+        a: sparse.csr_matrix, 
+        b: sparse.csr_matrix, 
+        a_norms: np.ndarray, 
+        b_norms: np.ndarray) -> sparse.csr_matrix:
+    dot = (a @ b.T).tocoo()
+    denominator = np.asarray(a_norms)[dot.row] * np.asarray(b_norms)[dot.col]
+    scores = np.divide(dot.data, denominator, out=np.zeros_like(dot.data), where=denominator > 0)
+    return sparse.csr_matrix((scores, (dot.row, dot.col)), shape=dot.shape)
+
+
+# Keyword ids are small integers handed out by the keyword table, so they are used as the
+# column indices directly and no vocabulary has to be built. width is one more than the
+# largest id (keyword_id_width), ids outside it are ignored like keywords missing from
+# a vocabulary.
+def keyword_id_width(*keyword_set_groups: Iterable[Iterable[int]]) -> int:
+    return 1 + max(
+        (max(keywords, default=-1) for keyword_sets in keyword_set_groups for keywords in keyword_sets),
+        default=-1)
+
+def encode_keyword_ids(keyword_sets: list[Iterable[int]], width: int) -> sparse.csr_matrix:
+    rows = [np.unique(np.fromiter(keywords, dtype=np.int64)) for keywords in keyword_sets]
+    rows = [row[row < width] for row in rows]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([row.size for row in rows])
+    indices = np.concatenate(rows).astype(np.int32) if rows else np.zeros(0, dtype=np.int32)
+    data = np.ones(indices.size, dtype=np.float32)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), width))
+
+def encode_weighted_keyword_ids(
+        keyword_weights: list[dict[int, float]], 
+        width: int, 
+        idf: Callable[[int], float]) -> sparse.csr_matrix:
+    row_lengths = [len(weights) for weights in keyword_weights]
+    count = sum(row_lengths)
+    rows = np.repeat(np.arange(len(keyword_weights)), row_lengths)
+    columns = np.fromiter(
+        (keyword_id for weights in keyword_weights for keyword_id in weights), 
+        dtype=np.int64, count=count)
+    keep = columns < width
+    data = np.fromiter(
+        (weight * idf(keyword_id) for weights in keyword_weights for keyword_id, weight in weights.items()), 
+        dtype=np.float32, count=count)
+    return sparse.csr_matrix(
+        (data[keep], (rows[keep], columns[keep])), 
+        shape=(len(keyword_weights), width))
+
+
+# Jaccard similarity of two sorted arrays of unique keyword ids
+def jaccard_ids(a: np.ndarray, b: np.ndarray) -> float:
+    intersection = np.intersect1d(a, b, assume_unique=True).size
+    union = a.size + b.size - intersection
+    return intersection / union if union else 0.0
+
+
+# Score a single keyword set against many, returns (id, score) pairs for non-zero scores
+def jaccard_scores(keywords: Iterable[Hashable], keyword_sets: dict[int, Iterable[Hashable]]) -> list[tuple[int, float]]:
+    if not keyword_sets:
+        return []
+    ids = list(keyword_sets.keys())
+    candidate_sets = list(keyword_sets.values())
+    vocabulary = build_vocabulary([keywords], candidate_sets)
+    scores = jaccard_matrix(
+        encode_keyword_sets([keywords], vocabulary),
+        encode_keyword_sets(candidate_sets, vocabulary))
+    row = scores.getrow(0)
+    return [(ids[column], float(score)) for column, score in zip(row.indices, row.data) if score > 0]
+
+
+# Top k (column, score) pairs for every row of a sparse score matrix
+def top_k_per_row(scores: sparse.csr_matrix, k: int) -> list[list[tuple[int, float]]]:
+    top_k = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        columns = scores.indices[start:end]
+        data = scores.data[start:end]
+        if len(data) > k:
+            best = np.argpartition(-data, k - 1)[:k]
+            columns, data = columns[best], data[best]
+        order = np.lexsort((columns, -data))
+        top_k.append([(int(columns[i]), float(data[i])) for i in order if data[i] > 0])
+    return top_k
+
+
+# Share of each row in b covered by each row in a, e.g. the share of a job post's skill
+# tags a student has. Only pairs with some overlap are stored.
+def coverage_matrix(a: sparse.csr_matrix, b: sparse.csr_matrix) -> sparse.csr_matrix:
+    overlap = (a @ b.T).tocoo()
+    coverage = overlap.data / row_sizes(b)[overlap.col]
+    return sparse.csr_matrix((coverage, (overlap.row, overlap.col)), shape=overlap.shape)
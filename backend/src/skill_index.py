@@ -0,0 +1,125 @@
+import asyncio
+import numpy as np
+from collections import defaultdict, Counter
+from typing import Type
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel, select
+from src.events.models import Event, EventSkillTag
+from src.content.models import Content, ContentSkillTag
+from src.keyword_extraction import keyword_cache
+from src.keyword_vocabulary import intern_keywords
+
+
+# In-memory index of skill id -> entity ids for entities that are tagged with skills
+# (events, content). Recommending an event or a piece of content only needs the
+# entities sharing at least one skill tag with the student, so the posting lists
+# avoid scanning every event on each request.
+# The index is loaded lazily on first use, crud.add_skill_to_entity and
+# crud.remove_skill_from_entity keep it up to date afterwards.
+# The keywords of an entity's text are extracted when the entity is created or its text
+# updated (extract_entity_keyword_ids) and stored with it as a sorted array of keyword
+# ids, so scoring only reads them from the rows it already fetched.
+
+class SkillEntityIndex:
+    def __init__(self, skill_tag_model: Type[SQLModel], foreign_key: str):
+        self.skill_tag_model = skill_tag_model
+        self.foreign_key = foreign_key
+        self.postings: dict[int, set[int]] = defaultdict(set)
+        self.entity_skills: dict[int, set[int]] = defaultdict(set)
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.entity_skills)
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            entity_column = getattr(self.skill_tag_model, self.foreign_key)
+            result = await session.exec(select(entity_column, self.skill_tag_model.skill_id))
+            for entity_id, skill_id in result.all():
+                self.add_skill(entity_id, skill_id)
+            self.loaded = True
+
+    def add_skill(self, entity_id: int, skill_id: int):
+        self.postings[skill_id].add(entity_id)
+        self.entity_skills[entity_id].add(skill_id)
+
+    def remove_skill(self, entity_id: int, skill_id: int):
+        posting = self.postings.get(skill_id)
+        if posting is not None:
+            posting.discard(entity_id)
+            if not posting:
+                del self.postings[skill_id]
+        skills = self.entity_skills.get(entity_id)
+        if skills is not None:
+            skills.discard(skill_id)
+            if not skills:
+                del self.entity_skills[entity_id]
+
+    # number of shared skill tags for every entity sharing at least one with skill_ids
+    def candidates(self, skill_ids) -> Counter:
+        overlap = Counter()
+        for skill_id in skill_ids:
+            posting = self.postings.get(skill_id)
+            if posting:
+                overlap.update(posting)
+        return overlap
+
+    def clear(self):
+        self.postings.clear()
+        self.entity_skills.clear()
+        self.loaded = False
+
+
+def event_text(event: Event):
+    return f"{event.name}. {event.description}"
+
+def json_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from json_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from json_strings(item)
+
+# the content body is free-form JSON, its string values are used as text
+def content_text(content: Content):
+    return ". ".join([content.title, *json_strings(content.content)])
+
+
+# sorted keyword ids of a text without the stopwords, stored with events and content
+async def extract_entity_keyword_ids(session: AsyncSession, text: str) -> list[int]:
+    keywords = await intern_keywords(session, await keyword_cache.extract(session, text))
+    return sorted(keywords)
+
+# entities stored before their keywords were extracted have none
+def entity_keyword_ids(entity: SQLModel) -> np.ndarray:
+    return np.array(entity.keyword_ids or [], dtype=np.int32)
+
+
+event_skill_index = SkillEntityIndex(EventSkillTag, "event_id")
+content_skill_index = SkillEntityIndex(ContentSkillTag, "content_id")
+
+# skill tag model -> index, used by the generic skill tag crud functions
+skill_indexes: dict[Type[SQLModel], SkillEntityIndex] = {
+    EventSkillTag: event_skill_index,
+    ContentSkillTag: content_skill_index,
+}
+
+
+# Keep the index of a skill tag model in sync after a skill tag has been committed,
+# the full load will pick it up if the index hasn't been built yet
+def refresh_skill_index(skill_tag_model: Type[SQLModel], entity_id: int, skill_id: int, removed: bool = False):
+    index = skill_indexes.get(skill_tag_model)
+    if index is None or not index.loaded:
+        return
+    if removed:
+        index.remove_skill(entity_id, skill_id)
+    else:
+        index.add_skill(entity_id, skill_id)
@@ -1,4 +1,4 @@
-from fastapi import Depends
+from fastapi import Depends, Query
 from src.auth.dependencies import get_token_data
 from src.auth.service import get_user_by_email
 from src.database import get_session
@@ -83,4 +83,14 @@ def student_activity_common_params(
     }
 
 StudentActivityCommonsDep = Annotated[dict, Depends(student_activity_common_params)]
-    
\ No newline at end of file
+
+def recommendation_common_params(
+    limit: int = Query(default=10, ge=1, le=50),
+    offset: int = Query(default=0, ge=0)
+):
+    return {
+        "limit": limit,
+        "offset": offset
+    }
+
+RecommendationCommonsDep = Annotated[dict, Depends(recommendation_common_params)]
@@ -1,7 +1,7 @@
 from datetime import datetime 
 from typing import TYPE_CHECKING, Union
 from enum import Enum
-from sqlmodel import SQLModel, Field, Relationship, AutoString, Column, text, TIMESTAMP
+from sqlmodel import SQLModel, Field, Relationship, AutoString, Column, text, TIMESTAMP, LargeBinary
 from src.models import ConstrainedId, Name, Description, LongDescription
 from src.auth.models import UserCreateForStudents, UserRead
 from src.job_posts.models import JobPost, JobPostRead
@@ -10,7 +10,7 @@ from src.skill_tags.models import AttachedSkillTagBase
 from pydantic import field_validator
 from src.utils import validate_website_url
 from src.job_posts.models import JobPostRead
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 
 if TYPE_CHECKING:
     from src.auth.models import User
@@ -79,7 +79,15 @@ class Student(StudentBase, table=True):
         default=None,
         sa_column=Column(TIMESTAMP(timezone=True), server_default=text("now()"), 
         onupdate=text("now()")))
-    
+    # highest degree level of the student's degrees, kept up to date by the student service
+    # so that recommendations don't need to join the degrees
+    highest_level_of_study: Union[str, None] = Field(default=None, exclude=True)
+    # MinHash signature of the keywords, only set when MinHash candidate generation is enabled
+    minhash_signature: Union[bytes, None] = Field(default=None, sa_type=LargeBinary, exclude=True)
+    # when the stored recommendations were last computed, a student can have none stored
+    # after being computed (e.g. no keywords) and must not be recomputed on every request
+    recommendations_computed_at: Union[datetime, None] = Field(
+        default=None, sa_type=TIMESTAMP(timezone=True), exclude=True)
     
 
     user: "User" = Relationship(back_populates="student")
@@ -106,6 +114,11 @@ class StudentRead(StudentBase):
 class StudentReadWithUser(StudentRead):
     user: UserRead
 
+# Student ranked against a company's job post
+class StudentCandidateRead(SQLModel):
+    student: StudentRead
+    score: float
+
 class StudentUpdate(SQLModel):
     current_employment_status: Union[CurrentEmploymentStatus, None] = None
     related_work_experience: bool = False
@@ -214,6 +227,8 @@ class ExternalProfileUpdate(SQLModel):
 
 class StudentSkillTag(AttachedSkillTagBase, table=True):
     __tablename__ = "student_skill_tags"
+    # skill -> students lookups for candidate search
+    __table_args__ = (Index("ix_student_skill_tags_skill_student", "skill_id", "student_id"),)
     student_id: ConstrainedId = Field(foreign_key="student.id",primary_key=True, sa_type=AutoString)
     skill_id: int = Field(foreign_key="skill_tag.id", primary_key=True)
  
@@ -252,12 +267,17 @@ class StudentJobPostRead(StudentJobPostBase):
 
 
 class StudentKeywordBase(SQLModel):
-    keyword: str = Field(max_length=100)
+    keyword_id: int = Field(foreign_key="keyword.id")
 
 class StudentKeyword(StudentKeywordBase, table=True):
     __tablename__ = "student_keyword"
-    id: Union[int, None] = Field(primary_key=True, default=None)
-    student_id: ConstrainedId = Field(foreign_key="student.id", sa_type=AutoString)
+    # keyword -> students lookups for recommendations and candidate search, the primary
+    # key covers student -> keywords
+    __table_args__ = (Index("ix_student_keyword_keyword_student", "keyword_id", "student_id"),)
+    student_id: ConstrainedId = Field(foreign_key="student.id", sa_type=AutoString, primary_key=True)
+    keyword_id: int = Field(foreign_key="keyword.id", primary_key=True)
+    # TextRank score of the keyword, normalised so the top keyword has a weight of 1
+    weight: float = Field(default=1)
 
     student: "Student" = Relationship(back_populates="keywords")
 
@@ -268,7 +288,24 @@ class StudentKeywordRead(StudentKeywordBase):
     pass
 
 class StudentKeywordUpdate(SQLModel):
-    keyword: str = Field(max_length=100)
+    keyword_id: int
+
+
+# Materialised job recommendations for a student, kept up to date when the
+# student's keywords change or when a job post is created, updated or closed
+class StudentRecommendation(SQLModel, table=True):
+    __tablename__ = "student_recommendation"
+    student_id: ConstrainedId = Field(foreign_key="student.id", primary_key=True, sa_type=AutoString)
+    job_post_id: int = Field(foreign_key="job_post.id", primary_key=True, index=True)
+    score: float
+    computed_at: Union[datetime, None] = Field(
+        default=None,
+        sa_column=Column(TIMESTAMP(timezone=True), server_default=text("now()")),
+    )
+
+    __table_args__ = (
+        Index('ix_student_recommendation_student_score', 'student_id', 'score'),
+    )
 
 
 
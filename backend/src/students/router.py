@@ -21,7 +21,8 @@ from src.students import service
 from src.students.dependencies import (
     verify_external_profile_access,
     verify_activity_access,
-    StudentActivityCommonsDep
+    StudentActivityCommonsDep,
+    RecommendationCommonsDep
 )
 from src.models import ConstrainedId
 from src.applications.models import JobApplicationReadWithJob, StudentJobPostApplicationCreate
@@ -35,7 +36,12 @@ from src.groups.models import GroupRead
 from src.interactions.service import update_interaction as student_update_interaction
 from src.interactions.models import StudentInteractionUpdate, InteractionReadWithStaff, InteractionCreate, InteractionReadWithStudent, InteractionReadWithStudentAndStaff
 from src.interactions.dependencies import verify_interaction_modify_access
-from src.recommendations import get_recommended_jobs
+from src.recommendations import get_recommended_jobs, get_recommended_events, get_recommended_content
+from src.content.models import ContentRead
+from src.job_profiles.models import JobProfileMatchRead
+from src.job_profiles.dependencies import JobProfileMatchCommonsDep
+from src.job_profiles.service import get_student_job_profile_matches
+from src.recommendation_cache import recommendation_cache
 from src.applications.dependencies import ApplicationCommonsDep
 from src.interactions.dependencies import InteractionCommonsDep
 from src.appointments.dependencies import AppointmentCommonsDep
@@ -194,16 +200,57 @@ async def get_own_student_interactions(
     interactions = await service.get_student_interactions(session=session, commons=commons)
     return interactions
 
+# Careers staff can see how well the recommendation cache is doing (hit rate, evictions)
+@router.get("/recommended-jobs/cache")
+async def get_recommendation_cache_stats(
+    current_user: User = Depends(get_current_active_staff_user),
+):
+    return recommendation_cache.stats()
+
 # Get recommended jobs for a student 
 @router.get("/me/recommended-jobs", response_model=list[JobPostRead])
 async def get_own_student_recommended_jobs(
     *,
+    commons: RecommendationCommonsDep,
     token_data: TokenData = Depends(get_current_active_student_user),
     session: AsyncSession = Depends(get_session)
 ):
-    job_posts = await get_recommended_jobs(session=session, student_id=token_data.related_entity_id)
+    job_posts = await get_recommended_jobs(session=session, student_id=token_data.related_entity_id, **commons)
     return job_posts
 
+# Get upcoming events recommended to a student from their skill tags and keywords
+@router.get("/me/recommended-events", response_model=list[EventRead])
+async def get_own_student_recommended_events(
+    *,
+    commons: RecommendationCommonsDep,
+    token_data: TokenData = Depends(get_current_active_student_user),
+    session: AsyncSession = Depends(get_session)
+):
+    events = await get_recommended_events(session=session, student_id=token_data.related_entity_id, **commons)
+    return events
+
+# Get content from a student's groups recommended from their skill tags and keywords
+@router.get("/me/recommended-content", response_model=list[ContentRead])
+async def get_own_student_recommended_content(
+    *,
+    commons: RecommendationCommonsDep,
+    token_data: TokenData = Depends(get_current_active_student_user),
+    session: AsyncSession = Depends(get_session)
+):
+    content = await get_recommended_content(session=session, student_id=token_data.related_entity_id, **commons)
+    return content
+
+# Get the job profiles that best fit a student's skill tags
+@router.get("/me/recommended-job-profiles", response_model=list[JobProfileMatchRead])
+async def get_own_student_recommended_job_profiles(
+    *,
+    commons: JobProfileMatchCommonsDep,
+    token_data: TokenData = Depends(get_current_active_student_user),
+    session: AsyncSession = Depends(get_session)
+):
+    job_profiles = await get_student_job_profile_matches(session=session, student_id=token_data.related_entity_id, **commons)
+    return job_profiles
+
 # Get a list of a students activties 
 @router.get("/me/activities", response_model=list[StudentActivityRead])
 async def get_own_student_activities(
@@ -612,13 +659,50 @@ async def create_job_post_and_application(
 @router.get("/{student_id}/recommended-jobs", response_model=list[JobPostRead])
 async def get_student_recommended_jobs(
     *,
+    commons: RecommendationCommonsDep,
     current_user: User = Depends(get_current_active_staff_user),
     student_id: ConstrainedId,
     session: AsyncSession = Depends(get_session)
 ):
-    job_posts = await get_recommended_jobs(session=session, student_id=student_id)
+    job_posts = await get_recommended_jobs(session=session, student_id=student_id, **commons)
     return job_posts
 
+# Careers staff can see events recommended to a student
+@router.get("/{student_id}/recommended-events", response_model=list[EventRead])
+async def get_student_recommended_events(
+    *,
+    commons: RecommendationCommonsDep,
+    current_user: User = Depends(get_current_active_staff_user),
+    student_id: ConstrainedId,
+    session: AsyncSession = Depends(get_session)
+):
+    events = await get_recommended_events(session=session, student_id=student_id, **commons)
+    return events
+
+# Careers staff can see content recommended to a student
+@router.get("/{student_id}/recommended-content", response_model=list[ContentRead])
+async def get_student_recommended_content(
+    *,
+    commons: RecommendationCommonsDep,
+    current_user: User = Depends(get_current_active_staff_user),
+    student_id: ConstrainedId,
+    session: AsyncSession = Depends(get_session)
+):
+    content = await get_recommended_content(session=session, student_id=student_id, **commons)
+    return content
+
+# Careers staff can see the job profiles that best fit a student's skill tags
+@router.get("/{student_id}/recommended-job-profiles", response_model=list[JobProfileMatchRead])
+async def get_student_recommended_job_profiles(
+    *,
+    commons: JobProfileMatchCommonsDep,
+    current_user: User = Depends(get_current_active_staff_user),
+    student_id: ConstrainedId,
+    session: AsyncSession = Depends(get_session)
+):
+    job_profiles = await get_student_job_profile_matches(session=session, student_id=student_id, **commons)
+    return job_profiles
+
 
 # careers staff can add skill tags to a student
 @router.post("/{student_id}/skill-tags/{skill_id}")
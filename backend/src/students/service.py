@@ -54,7 +54,11 @@ from sqlalchemy import or_
 from typing import Union
 from src.groups.models import GroupMember, Group
 from src.interactions.models import Interaction, InteractionCreate
-from src.keyword_extraction import extract_keywords, create_keywords, sync_keywords
+from src.keyword_extraction import keyword_cache, normalise_text, create_keywords, sync_keywords
+from src.recommendations import refresh_student_recommendations
+from src.students.utils import update_highest_level_of_study
+from src.recommendation_cache import recommendation_cache
+from src.minhash import compute_minhash_signature
 from src.events.dependencies import EventCommonsDep
 from src.applications.dependencies import ApplicationCommonsDep
 from src.applications.service import get_job_applications, get_job_application_by_id
@@ -93,6 +97,8 @@ async def get_student_with_user(session: AsyncSession, student_id: ConstrainedId
     return student
 
 async def create_student(session: AsyncSession, student: StudentUserCreate):
+    # extracted first, a busy extraction pool rejects the request before anything is created
+    extracted_keywords = await keyword_cache.extract(session, student.about) if student.about is not None else None
     db_student_user = await create_user(
         user=student,
         session=session
@@ -103,9 +109,10 @@ async def create_student(session: AsyncSession, student: StudentUserCreate):
         session=session,
         extra_data={"user_id": db_student_user.id}
     )
-    if student.about is not None:
-        extracted_keywords = extract_keywords(student.about)
-        await create_keywords(session, student.id, "Student", extracted_keywords)
+    if extracted_keywords is not None:
+        keywords = await create_keywords(session, student.id, "Student", extracted_keywords)
+        student.minhash_signature = compute_minhash_signature(keywords)
+        await refresh_student_recommendations(session, student.id, commit=False)
     await session.commit()
     await session.refresh(student)
     return student
@@ -120,15 +127,22 @@ async def update_student(
     if student is None:
         raise StudentNotFound()
     
+    keywords_changed = False
     if student_update.about:
-        if student.about != student_update.about:
-            await sync_keywords(session, student_id, student_update.about, "Student")
+        if student.about is None or normalise_text(student.about) != normalise_text(student_update.about):
+            keywords = await sync_keywords(session, student_id, student_update.about, "Student")
+            student.minhash_signature = compute_minhash_signature(keywords)
+            keywords_changed = True
 
 
     student_update_data = student_update.model_dump(exclude_unset=True)
     student.sqlmodel_update(student_update_data)
     session.add(student)
+    if keywords_changed:
+        await refresh_student_recommendations(session, student_id, commit=False)
     await session.commit()
+    if keywords_changed:
+        recommendation_cache.invalidate_student(student_id)
     await session.refresh(student)
     return await get_student_with_user(session, student_id)
     
@@ -188,6 +202,10 @@ async def add_degree_to_student(
         create_data=StudentDegreeCreate(**student_degree_data),
         session=session
     )
+    # the level of study decides which job posts the student is eligible for
+    await update_highest_level_of_study(session, student_id, commit=False)
+    await refresh_student_recommendations(session, student_id)
+    await session.refresh(db_degree_data)
     return db_degree_data
 
 
@@ -214,6 +232,8 @@ async def remove_degree_from_student(
     student_degree = result.first()
     await session.delete(student_degree)
     await session.commit()
+    await update_highest_level_of_study(session, student_id, commit=False)
+    await refresh_student_recommendations(session, student_id)
 
 
 async def get_external_profile_by_id(
@@ -315,7 +335,7 @@ async def add_skill_tag_to_student(
         session: AsyncSession, 
         student_id: ConstrainedId, 
         skill_id: int):
-    return await add_skill_to_entity(
+    db_skill_tag = await add_skill_to_entity(
         skill_tag_base_model=StudentSkillTag,
         skill_tag_create_model=StudentSkillTagCreate,
         entity_id=student_id,
@@ -323,6 +343,11 @@ async def add_skill_tag_to_student(
         foreign_key="student_id",
         exception=SkillTagAlreadyExists,
         session=session)
+    # skill tags are part of the recommendation score
+    if db_skill_tag is not None:
+        await refresh_student_recommendations(session, student_id)
+        await session.refresh(db_skill_tag)
+    return db_skill_tag
 
 
 
@@ -338,6 +363,7 @@ async def remove_skill_tag_from_student(
         foreign_key="student_id",
         exception=SkillTagNotAttached,
         session=session)
+    await refresh_student_recommendations(session, student_id)
     
 
 async def get_student_external_profiles(session: AsyncSession, student_id: ConstrainedId):
@@ -2,34 +2,55 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from src.students.models import Student, StudentDegree
 from src.students.exceptions import StudentNotFound
-from sqlalchemy.orm import selectinload, joinedload
 from src. degrees.models import Degree
+from src.models import ConstrainedId
+from typing import Union
 
 
-async def get_highest_level_of_study(session: AsyncSession, student_id: int):
+degreeLevelsMap = {
+    "Foundation": 0,
+    "Undergraduate": 1,
+    "Postgraduate": 2,
+    "PhD": 3
+}
+
+
+def highest_level(degree_levels):
+    highest_level_of_study = None
+    for degree_level in degree_levels:
+        if highest_level_of_study is None or degreeLevelsMap[degree_level] > degreeLevelsMap[highest_level_of_study]:
+            highest_level_of_study = degree_level
+    return highest_level_of_study
+
+
+# Works the highest level of study out from the student's degrees and stores it on the
+# student, called whenever a degree is added or removed
+async def update_highest_level_of_study(session: AsyncSession, student_id: ConstrainedId, commit: bool = True):
+    student = await session.get(Student, student_id)
+    if student is None:
+        raise StudentNotFound()
     result = await session.exec(
-        select(Student)
-        .options(selectinload(Student.degrees)
-                 .joinedload(StudentDegree.degree))
-        .where(Student.id == student_id)
-    )
+        select(Degree.degree_level)
+        .join(StudentDegree, StudentDegree.degree_code == Degree.degree_code)
+        .where(StudentDegree.student_id == student_id))
+    student.highest_level_of_study = highest_level(result.all())
+    session.add(student)
+    if commit:
+        await session.commit()
+    return student.highest_level_of_study
+
 
-    student = result.first()
+async def get_highest_level_of_study(session: AsyncSession, student_id: int):
+    student = await session.get(Student, student_id)
     if student is None:
         raise StudentNotFound()
-    
-    degreeLevelsMap = {
-        "Foundation": 0,
-        "Undergraduate": 1,
-        "Postgraduate": 2,
-        "PhD": 3
-    }
-    
-    highest_level_of_study = None
-    for student_degree in student.degrees:
-        if highest_level_of_study is None:
-            highest_level_of_study = student_degree.degree.degree_level
-        else:
-            if degreeLevelsMap[student_degree.degree.degree_level] > degreeLevelsMap[highest_level_of_study]:
-                highest_level_of_study = student_degree.degree.degree_level
-    return highest_level_of_study
+    return student.highest_level_of_study
+
+
+# Highest level of study for many students in one query, students without a degree are left out
+async def get_highest_levels_of_study(session: AsyncSession, student_ids: Union[list[ConstrainedId], None] = None):
+    query = select(Student.id, Student.highest_level_of_study).where(Student.highest_level_of_study != None)
+    if student_ids is not None:
+        query = query.where(Student.id.in_(student_ids))
+    result = await session.exec(query)
+    return dict(result.all())
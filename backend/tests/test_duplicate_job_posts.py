@@ -0,0 +1,50 @@
+from src.job_posts.models import DegreeRequired
+from src.keyword_index import JobPostKeywordIndex
+from src.simhash import compute_simhash
+
+
+DESCRIPTION = (
+    "We are looking for a graduate software engineer to join our platform team. "
+    "You will design, build and maintain backend services in Python, work closely "
+    "with product managers and designers, review code and take part in the on-call "
+    "rotation. Experience with SQL databases and cloud infrastructure is a plus.")
+
+KEYWORDS = {1: 1.0, 2: 0.8, 3: 0.5}
+
+
+# adds a job post the way the job post service does, flagged as a duplicate if it is one
+def add_job_post(index: JobPostKeywordIndex, job_post_id: int, company_name: str, description: str):
+    simhash = compute_simhash(description)
+    duplicate_of = index.find_duplicate(simhash, company_name, exclude=job_post_id)
+    index.add_job_post(
+        job_post_id,
+        KEYWORDS,
+        DegreeRequired.ALL_GRADES,
+        simhash=simhash,
+        company_name=company_name,
+        duplicate_of=duplicate_of)
+    return duplicate_of
+
+
+def test_identical_descriptions_from_different_companies_are_both_recommended():
+    index = JobPostKeywordIndex()
+    assert add_job_post(index, 1, "Acme Ltd", DESCRIPTION) is None
+    assert add_job_post(index, 2, "Globex", DESCRIPTION) is None
+    assert set(index.candidates(KEYWORDS)) == {1, 2}
+
+
+def test_near_duplicates_from_the_same_company_are_collapsed():
+    index = JobPostKeywordIndex()
+    add_job_post(index, 1, "Acme Ltd", DESCRIPTION)
+    assert add_job_post(index, 2, " acme  LTD", DESCRIPTION.replace("graduate", "junior")) == 1
+    assert set(index.candidates(KEYWORDS)) == {1}
+
+
+def test_duplicates_are_handed_over_when_the_job_post_is_removed():
+    index = JobPostKeywordIndex()
+    add_job_post(index, 1, "Acme Ltd", DESCRIPTION)
+    add_job_post(index, 2, "Acme Ltd", DESCRIPTION)
+    add_job_post(index, 3, "Acme Ltd", DESCRIPTION)
+    index.remove_job_post(1)
+    index.hand_over_duplicates({1: 2})
+    assert set(index.candidates(KEYWORDS)) == {2}